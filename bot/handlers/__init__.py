@@ -5,12 +5,19 @@ from . import payment
 from . import status
 from . import admin
 
+# Роутеры обработчиков в порядке приоритета
+ROUTERS = (
+    start.router,
+    payment.router,
+    status.router,
+    admin.router,
+)
+
 
 def register_all_handlers(dp: Dispatcher):
     """Регистрация всех обработчиков"""
     
-    # Регистрируем обработчики в порядке приоритета
-    start.register_handlers(dp)
-    payment.register_handlers(dp)
-    status.register_handlers(dp)
-    admin.register_handlers(dp)
\ No newline at end of file
+    for router in ROUTERS:
+        # Роутер подключается один раз - повторный вызов (тесты, перезапуск) ничего не делает
+        if router.parent_router is None:
+            dp.include_router(router)
\ No newline at end of file
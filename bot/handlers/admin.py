@@ -1,16 +1,27 @@
 import logging
+import asyncio
+import contextlib
+import os
+import re
+from pathlib import Path
+from typing import List, Tuple
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
-from config.settings import ADMIN_IDS, SUBSCRIPTION_PRICE
+from config.settings import (
+    ADMIN_IDS, SUBSCRIPTION_PRICE, SUBSCRIPTION_DURATION_DAYS, WEBHOOK_HOST, CHANNEL_ID, LOG_DIR
+)
 from services.subscription_service import subscription_service
 from services.telegram_service import telegram_service
-from bot.keyboards.inline import get_admin_keyboard, get_confirmation_keyboard, get_user_management_keyboard
+from bot.keyboards.inline import (
+    get_admin_keyboard, get_admin_stats_keyboard, get_confirmation_keyboard, get_user_management_keyboard
+)
 from bot.states.payment_states import AdminStates
 from bot.middleware.auth import AdminFilter
 from database.database import db
+from utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -19,64 +30,192 @@ router = Router()
 router.message.filter(AdminFilter())
 router.callback_query.filter(AdminFilter())
 
+# Как часто (в пачках) обновлять сообщение с прогрессом рассылки
+BROADCAST_PROGRESS_EVERY = 10
+# Через сколько секунд показывать "рассылка в процессе" (быстрые рассылки обходятся без него)
+BROADCAST_PROGRESS_DELAY = 0.5
+
+# Список файлов логов кэшируется на LOG_SCAN_TTL секунд (одна запись)
+LOG_SCAN_TTL = 10
+_log_files_cache = TTLCache(ttl=LOG_SCAN_TTL, maxsize=1)
+
+# Аргументы админских команд (команда может быть указана с @username бота)
+KICK_COMMAND_RE = re.compile(r"^/kick(?:@\w+)?\s+(\d+)\s*$")
+EXTEND_COMMAND_RE = re.compile(r"^/extend(?:@\w+)?\s+(\d+)\s+(\d{1,3})\s*$")
+MAX_EXTEND_DAYS = 365
+
+# Админская клавиатура одинакова для всех экранов - создаем один раз
+ADMIN_KEYBOARD = get_admin_keyboard()
+ADMIN_STATS_KEYBOARD = get_admin_stats_keyboard()
+
+# Шаблоны сообщений (статичные части собираются при импорте модуля)
+ADMIN_PANEL_TEXT = (
+    "🔧 <b>Панель администратора</b>\n\n"
+    "Выберите действие:"
+)
+
+STATS_TEMPLATE = """
+📊 <b>Статистика системы</b>
+
+👥 <b>Пользователи:</b>
+• Активных подписок: {active}
+• Истекших: {expired}
+• На пробном периоде: {trial}
+• Заблокированных: {suspended}
+• Всего зарегистрировано: {total}
+
+💰 <b>Доходы (30 дней):</b>
+• Общая сумма: {total_revenue} руб
+• Успешных платежей: {successful_payments}
+• Неудачных платежей: {failed_payments}
+
+📢 <b>Канал:</b>
+• Участников: {member_count}
+• Цена подписки: {price} руб/мес
+""".strip()
+
+USERS_TEXT = """
+👥 <b>Управление пользователями</b>
+
+Введите ID пользователя для управления:
+""".strip()
+
+PAYMENTS_TEXT = """
+💰 <b>Управление платежами</b>
+
+Доступные действия:
+• Просмотр последних платежей
+• Поиск платежа по ID
+• Создание возврата
+• Статистика по платежам
+
+Функционал в разработке...
+""".strip()
+
+# Настройки читаются из .env при старте и не меняются до перезапуска
+SETTINGS_TEXT = f"""
+⚙️ <b>Настройки системы</b>
+
+<b>Подписка:</b>
+• Цена: {SUBSCRIPTION_PRICE} руб
+• Длительность: {SUBSCRIPTION_DURATION_DAYS} дней
+
+<b>Webhook:</b>
+• Хост: {WEBHOOK_HOST}
+
+<b>Канал:</b>
+• ID: {CHANNEL_ID}
+
+Для изменения настроек отредактируйте .env файл и перезапустите бота.
+""".strip()
+
+LOGS_TEMPLATE = """
+📝 <b>Логи системы</b>
+
+<b>Файлы логов:</b>
+{log_files}
+
+<b>Директория:</b> {log_dir}
+
+Для просмотра логов используйте команды сервера или файловый менеджер.
+""".strip()
+
+
+def _scan_log_files(log_dir: Path) -> List[Tuple[str, int]]:
+    """Список файлов логов с размерами (блокирующий, выполняется в отдельном потоке)"""
+    try:
+        with os.scandir(log_dir) as entries:
+            return sorted(
+                (entry.name, entry.stat().st_size)
+                for entry in entries
+                if entry.name.endswith(".log") and entry.is_file()
+            )
+    except FileNotFoundError:
+        return []
+
+
+async def _get_log_files() -> List[Tuple[str, int]]:
+    """Получить список файлов логов (с кэшированием, вся файловая работа - в потоке)"""
+    return await _log_files_cache.get_or_set(
+        LOG_DIR, lambda: asyncio.to_thread(_scan_log_files, LOG_DIR)
+    )
+
+
+async def _delayed_broadcast_progress(message: Message, delay: float):
+    """Показать статус рассылки, если она не завершилась за delay секунд"""
+    await asyncio.sleep(delay)
+    try:
+        await message.edit_text("📤 Рассылка в процессе...")
+    except Exception:
+        logger.exception("Ошибка обновления статуса рассылки")
+
 
 @router.message(Command("admin"))
 async def admin_panel(message: Message):
     """Главная админ панель"""
     try:
         await message.answer(
-            "🔧 <b>Панель администратора</b>\n\n"
-            "Выберите действие:",
-            reply_markup=get_admin_keyboard(),
+            ADMIN_PANEL_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         
-    except Exception as e:
-        logger.error(f"Ошибка в админ панели: {e}")
+    except Exception:
+        logger.exception("Ошибка в админ панели")
         await message.answer("❌ Ошибка открытия админ панели")
 
 
-@router.callback_query(F.data == "admin_stats")
+@router.callback_query(F.data.in_({"admin_stats", "admin_stats_force"}))
 async def admin_stats_callback(callback: CallbackQuery):
     """Статистика пользователей и платежей"""
     try:
-        # Получаем статистику
-        user_stats = await subscription_service.get_users_count_by_status()
-        revenue_stats = await subscription_service.get_revenue_stats(days=30)
+        # Статистика из базы и информация о канале не зависят друг от друга -
+        # запрашиваем их параллельно
+        user_stats, revenue_stats, channel_info = await asyncio.gather(
+            subscription_service.get_users_count_by_status(),
+            subscription_service.get_revenue_stats(days=30),
+            # Кнопка "Обновить" сбрасывает кэш информации о канале
+            telegram_service.get_cached_channel_info(
+                force_refresh=callback.data == "admin_stats_force"
+            ),
+            return_exceptions=True
+        )
+        
+        for result in (user_stats, revenue_stats, channel_info):
+            if isinstance(result, Exception):
+                logger.error("Ошибка получения данных для статистики: %s", result)
+        
+        if isinstance(user_stats, Exception):
+            user_stats = {}
+        if isinstance(revenue_stats, Exception):
+            revenue_stats = {}
+        if isinstance(channel_info, Exception):
+            channel_info = None
         
-        # Получаем информацию о канале
-        channel_info = await telegram_service.get_channel_info()
         member_count = channel_info.get("member_count", "Неизвестно") if channel_info else "Неизвестно"
         
-        message = f"""
-📊 <b>Статистика системы</b>
-
-👥 <b>Пользователи:</b>
-• Активных подписок: {user_stats.get('active', 0)}
-• Истекших: {user_stats.get('expired', 0)}
-• На пробном периоде: {user_stats.get('trial', 0)}
-• Заблокированных: {user_stats.get('suspended', 0)}
-• Всего зарегистрировано: {user_stats.get('total', 0)}
-
-💰 <b>Доходы (30 дней):</b>
-• Общая сумма: {revenue_stats.get('total_revenue', 0)} руб
-• Успешных платежей: {revenue_stats.get('successful_payments', 0)}
-• Неудачных платежей: {revenue_stats.get('failed_payments', 0)}
-
-📢 <b>Канал:</b>
-• Участников: {member_count}
-• Цена подписки: {SUBSCRIPTION_PRICE} руб/мес
-        """.strip()
+        message = STATS_TEMPLATE.format(
+            active=user_stats.get('active', 0),
+            expired=user_stats.get('expired', 0),
+            trial=user_stats.get('trial', 0),
+            suspended=user_stats.get('suspended', 0),
+            total=user_stats.get('total', 0),
+            total_revenue=revenue_stats.get('total_revenue', 0),
+            successful_payments=revenue_stats.get('successful_payments', 0),
+            failed_payments=revenue_stats.get('failed_payments', 0),
+            member_count=member_count,
+            price=SUBSCRIPTION_PRICE
+        )
         
         await callback.message.edit_text(
             message,
-            reply_markup=get_admin_keyboard(),
+            reply_markup=ADMIN_STATS_KEYBOARD,
             parse_mode="HTML"
         )
         await callback.answer("📊 Статистика обновлена")
         
-    except Exception as e:
-        logger.error(f"Ошибка получения статистики: {e}")
+    except Exception:
+        logger.exception("Ошибка получения статистики")
         await callback.answer("❌ Ошибка получения статистики", show_alert=True)
 
 
@@ -84,21 +223,15 @@ async def admin_stats_callback(callback: CallbackQuery):
 async def admin_users_callback(callback: CallbackQuery):
     """Управление пользователями"""
     try:
-        message = """
-👥 <b>Управление пользователями</b>
-
-Введите ID пользователя для управления:
-        """.strip()
-        
         await callback.message.edit_text(
-            message,
-            reply_markup=get_admin_keyboard(),
+            USERS_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка в управлении пользователями: {e}")
+    except Exception:
+        logger.exception("Ошибка в управлении пользователями")
         await callback.answer("❌ Ошибка", show_alert=True)
 
 
@@ -109,15 +242,15 @@ async def admin_broadcast_callback(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             "📢 <b>Рассылка сообщений</b>\n\n"
             "Отправьте сообщение, которое нужно разослать всем пользователям:",
-            reply_markup=get_admin_keyboard(),
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         
         await state.set_state(AdminStates.waiting_broadcast_message)
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка в рассылке: {e}")
+    except Exception:
+        logger.exception("Ошибка в рассылке")
         await callback.answer("❌ Ошибка", show_alert=True)
 
 
@@ -127,9 +260,8 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     try:
         broadcast_text = message.text or message.caption or "Сообщение без текста"
         
-        # Получаем всех активных пользователей (упрощенная версия)
-        # В реальном проекте нужен отдельный метод для получения всех пользователей
-        user_ids = [123456789]  # Заглушка
+        # Сами ID будут получены из базы потоком при отправке
+        recipients_count = await db.count_active_users()
         
         # Показываем подтверждение
         confirmation_text = f"""
@@ -138,14 +270,14 @@ async def process_broadcast_message(message: Message, state: FSMContext):
 <b>Сообщение:</b>
 {broadcast_text[:200]}{'...' if len(broadcast_text) > 200 else ''}
 
-<b>Количество получателей:</b> {len(user_ids)}
+<b>Количество получателей:</b> {recipients_count}
 
 Отправить рассылку?
         """.strip()
         
         await state.update_data(
             broadcast_text=broadcast_text,
-            user_ids=user_ids
+            recipients_count=recipients_count
         )
         
         await message.answer(
@@ -154,8 +286,8 @@ async def process_broadcast_message(message: Message, state: FSMContext):
             parse_mode="HTML"
         )
         
-    except Exception as e:
-        logger.error(f"Ошибка обработки сообщения для рассылки: {e}")
+    except Exception:
+        logger.exception("Ошибка обработки сообщения для рассылки")
         await message.answer("❌ Ошибка обработки сообщения")
         await state.clear()
 
@@ -164,19 +296,48 @@ async def process_broadcast_message(message: Message, state: FSMContext):
 async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
     """Подтверждение и выполнение рассылки"""
     try:
+        # Данные читаем один раз и сразу сбрасываем состояние: дальше работаем
+        # с локальной копией, а повторное нажатие не запустит рассылку заново
         data = await state.get_data()
+        await state.clear()
         broadcast_text = data.get('broadcast_text')
-        user_ids = data.get('user_ids', [])
+        recipients_count = data.get('recipients_count', 0)
         
-        if not broadcast_text or not user_ids:
+        if not broadcast_text or not recipients_count:
             await callback.answer("❌ Данные для рассылки не найдены", show_alert=True)
-            await state.clear()
             return
         
-        await callback.message.edit_text("📤 Начинаем рассылку...")
+        # Промежуточный статус отправляем только если рассылка затянулась
+        progress_task = asyncio.create_task(
+            _delayed_broadcast_progress(callback.message, BROADCAST_PROGRESS_DELAY)
+        )
         
-        # Выполняем рассылку
-        results = await telegram_service.broadcast_message(user_ids, broadcast_text)
+        chunks_sent = 0
+        
+        async def show_progress(progress: dict):
+            nonlocal chunks_sent
+            chunks_sent += 1
+            if chunks_sent % BROADCAST_PROGRESS_EVERY:
+                return
+            
+            # Ошибка обновления прогресса не должна прерывать рассылку
+            try:
+                await callback.message.edit_text(
+                    f"📤 Рассылка... Обработано {progress['total']} из {recipients_count}"
+                )
+            except Exception as e:
+                logger.warning("Не удалось обновить прогресс рассылки: %s", e)
+        
+        try:
+            # Получатели читаются из базы постранично и рассылаются пачками
+            results = await telegram_service.broadcast_message(
+                db.iter_active_user_ids(), broadcast_text, on_progress=show_progress
+            )
+        finally:
+            # Дожидаемся отмены, чтобы отложенный статус не перезаписал итоговое сообщение
+            progress_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await progress_task
         
         # Показываем результаты
         result_text = f"""
@@ -191,44 +352,30 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
         
         await callback.message.edit_text(
             result_text,
-            reply_markup=get_admin_keyboard(),
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         
-        await state.clear()
-        logger.info(f"Рассылка выполнена админом {callback.from_user.id}: {results}")
+        logger.info("Рассылка выполнена админом %s: %s", callback.from_user.id, results)
         
-    except Exception as e:
-        logger.error(f"Ошибка выполнения рассылки: {e}")
+    except Exception:
+        logger.exception("Ошибка выполнения рассылки")
         await callback.answer("❌ Ошибка выполнения рассылки", show_alert=True)
-        await state.clear()
 
 
 @router.callback_query(F.data == "admin_payments")
 async def admin_payments_callback(callback: CallbackQuery):
     """Управление платежами"""
     try:
-        message = """
-💰 <b>Управление платежами</b>
-
-Доступные действия:
-• Просмотр последних платежей
-• Поиск платежа по ID
-• Создание возврата
-• Статистика по платежам
-
-Функционал в разработке...
-        """.strip()
-        
         await callback.message.edit_text(
-            message,
-            reply_markup=get_admin_keyboard(),
+            PAYMENTS_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка в управлении платежами: {e}")
+    except Exception:
+        logger.exception("Ошибка в управлении платежами")
         await callback.answer("❌ Ошибка", show_alert=True)
 
 
@@ -236,33 +383,15 @@ async def admin_payments_callback(callback: CallbackQuery):
 async def admin_settings_callback(callback: CallbackQuery):
     """Настройки системы"""
     try:
-        from config.settings import SUBSCRIPTION_PRICE, SUBSCRIPTION_DURATION_DAYS, WEBHOOK_HOST
-        
-        message = f"""
-⚙️ <b>Настройки системы</b>
-
-<b>Подписка:</b>
-• Цена: {SUBSCRIPTION_PRICE} руб
-• Длительность: {SUBSCRIPTION_DURATION_DAYS} дней
-
-<b>Webhook:</b>
-• Хост: {WEBHOOK_HOST}
-
-<b>Канал:</b>
-• ID: {telegram_service.channel_id if telegram_service else 'Не настроен'}
-
-Для изменения настроек отредактируйте .env файл и перезапустите бота.
-        """.strip()
-        
         await callback.message.edit_text(
-            message,
-            reply_markup=get_admin_keyboard(),
+            SETTINGS_TEXT,
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка в настройках: {e}")
+    except Exception:
+        logger.exception("Ошибка в настройках")
         await callback.answer("❌ Ошибка", show_alert=True)
 
 
@@ -270,37 +399,25 @@ async def admin_settings_callback(callback: CallbackQuery):
 async def admin_logs_callback(callback: CallbackQuery):
     """Просмотр логов"""
     try:
-        import os
-        from pathlib import Path
-        from config.settings import LOG_DIR
-        
-        log_files = []
-        if LOG_DIR.exists():
-            for log_file in LOG_DIR.glob("*.log"):
-                size = log_file.stat().st_size
-                size_mb = size / (1024 * 1024)
-                log_files.append(f"• {log_file.name}: {size_mb:.1f} MB")
-        
-        message = f"""
-📝 <b>Логи системы</b>
-
-<b>Файлы логов:</b>
-{chr(10).join(log_files) if log_files else '• Логи не найдены'}
-
-<b>Директория:</b> {LOG_DIR}
-
-Для просмотра логов используйте команды сервера или файловый менеджер.
-        """.strip()
+        log_files = [
+            f"• {name}: {size / (1024 * 1024):.1f} MB"
+            for name, size in await _get_log_files()
+        ]
+        
+        message = LOGS_TEMPLATE.format(
+            log_files="\n".join(log_files) if log_files else "• Логи не найдены",
+            log_dir=LOG_DIR
+        )
         
         await callback.message.edit_text(
             message,
-            reply_markup=get_admin_keyboard(),
+            reply_markup=ADMIN_KEYBOARD,
             parse_mode="HTML"
         )
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка просмотра логов: {e}")
+    except Exception:
+        logger.exception("Ошибка просмотра логов")
         await callback.answer("❌ Ошибка", show_alert=True)
 
 
@@ -308,16 +425,12 @@ async def admin_logs_callback(callback: CallbackQuery):
 async def kick_user_command(message: Message):
     """Команда исключения пользователя"""
     try:
-        args = message.text.split()
-        if len(args) != 2:
+        match = KICK_COMMAND_RE.match(message.text or "")
+        if match is None:
             await message.answer("❌ Использование: /kick <user_id>")
             return
         
-        try:
-            user_id = int(args[1])
-        except ValueError:
-            await message.answer("❌ Некорректный ID пользователя")
-            return
+        user_id = int(match.group(1))
         
         # Отменяем подписку
         success = await subscription_service.cancel_subscription(user_id, "admin_kick")
@@ -327,8 +440,8 @@ async def kick_user_command(message: Message):
         else:
             await message.answer(f"❌ Ошибка исключения пользователя {user_id}")
         
-    except Exception as e:
-        logger.error(f"Ошибка команды /kick: {e}")
+    except Exception:
+        logger.exception("Ошибка команды /kick")
         await message.answer("❌ Ошибка выполнения команды")
 
 
@@ -336,20 +449,16 @@ async def kick_user_command(message: Message):
 async def extend_subscription_command(message: Message):
     """Команда продления подписки"""
     try:
-        args = message.text.split()
-        if len(args) != 3:
+        match = EXTEND_COMMAND_RE.match(message.text or "")
+        if match is None:
             await message.answer("❌ Использование: /extend <user_id> <days>")
             return
         
-        try:
-            user_id = int(args[1])
-            days = int(args[2])
-        except ValueError:
-            await message.answer("❌ Некорректные параметры")
-            return
+        user_id = int(match.group(1))
+        days = int(match.group(2))
         
-        if days <= 0 or days > 365:
-            await message.answer("❌ Количество дней должно быть от 1 до 365")
+        if days <= 0 or days > MAX_EXTEND_DAYS:
+            await message.answer(f"❌ Количество дней должно быть от 1 до {MAX_EXTEND_DAYS}")
             return
         
         # Продлеваем подписку
@@ -360,8 +469,8 @@ async def extend_subscription_command(message: Message):
         else:
             await message.answer(f"❌ Ошибка продления подписки для {user_id}")
         
-    except Exception as e:
-        logger.error(f"Ошибка команды /extend: {e}")
+    except Exception:
+        logger.exception("Ошибка команды /extend")
         await message.answer("❌ Ошибка выполнения команды")
 
 
@@ -1,5 +1,7 @@
 import logging
 import asyncio
+from datetime import datetime
+from typing import Optional
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
@@ -32,7 +34,7 @@ async def pay_command(message: Message, state: FSMContext):
         if user.is_subscription_active:
             await message.answer(
                 f"✅ У вас уже есть активная подписка!\n\n"
-                f"📅 Действует до: {user.subscription_end.strftime('%d.%m.%Y %H:%M')}\n"
+                f"📅 Действует до: {user.subscription_end_fmt}\n"
                 f"⏰ Осталось дней: {user.days_left}\n\n"
                 f"💡 Вы можете продлить подписку заранее - новый период добавится к текущему.",
                 reply_markup=get_subscription_keyboard()
@@ -80,7 +82,7 @@ async def pay_command(message: Message, state: FSMContext):
             if test_mode:
                 asyncio.create_task(auto_complete_test_payment(payment.payment_id, user_id))
             
-            logger.info(f"Создан платеж {payment.payment_id} для пользователя {user_id} (тест: {test_mode})")
+            logger.info("Создан платеж %s для пользователя %s (тест: %s)", payment.payment_id, user_id, test_mode)
             
         else:
             await message.answer(
@@ -88,8 +90,8 @@ async def pay_command(message: Message, state: FSMContext):
                 reply_markup=get_subscription_keyboard()
             )
             
-    except Exception as e:
-        logger.error(f"Ошибка в обработчике /pay: {e}")
+    except Exception:
+        logger.exception("Ошибка в обработчике /pay")
         await message.answer(
             "❌ Произошла ошибка. Попробуйте позже.",
             reply_markup=get_subscription_keyboard()
@@ -102,22 +104,21 @@ async def auto_complete_test_payment(payment_id: str, user_id: int):
         # Ждем 5 секунд
         await asyncio.sleep(5)
         
-        # Получаем платеж из БД
-        payment = await db.get_payment(payment_id)
-        if not payment or payment.status != PaymentStatus.PENDING:
+        # Атомарно завершаем только ожидающий платеж (его могла обработать кнопка проверки)
+        payment = await db.update_payment_status(
+            payment_id, user_id, PaymentStatus.SUCCEEDED, datetime.now(),
+            expected_status=PaymentStatus.PENDING
+        )
+        if not payment:
             return
         
-        # Обновляем статус платежа
-        payment.status = PaymentStatus.SUCCEEDED
-        await db.save_payment(payment)
-        
         # Активируем подписку
         await subscription_service.activate_subscription(user_id, payment)
         
-        logger.info(f"Тестовый платеж {payment_id} автоматически завершен")
+        logger.info("Тестовый платеж %s автоматически завершен", payment_id)
         
-    except Exception as e:
-        logger.error(f"Ошибка автозавершения тестового платежа: {e}")
+    except Exception:
+        logger.exception("Ошибка автозавершения тестового платежа")
 
 
 @router.callback_query(F.data == "pay_subscription")
@@ -130,29 +131,29 @@ async def pay_subscription_callback(callback: CallbackQuery, state: FSMContext):
         await pay_command(message, state)
         await callback.answer()
         
-    except Exception as e:
-        logger.error(f"Ошибка в pay_subscription callback: {e}")
+    except Exception:
+        logger.exception("Ошибка в pay_subscription callback")
         await callback.answer("❌ Ошибка создания платежа", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("check_payment:"))
 async def check_payment_callback(callback: CallbackQuery, state: FSMContext):
     """Обработчик проверки статуса платежа"""
+    payment_id = callback.data.split(":", 1)[1]
+    await _process_payment_check(callback, payment_id, state)
+
+
+async def _process_payment_check(callback: CallbackQuery, payment_id: str, state: FSMContext):
+    """Проверка статуса платежа и активация подписки после оплаты"""
     try:
-        payment_id = callback.data.split(":", 1)[1]
         user_id = callback.from_user.id
         
-        # Получаем платеж из базы данных
-        payment = await db.get_payment(payment_id)
+        # Получаем платеж пользователя (чужие платежи не находятся)
+        payment = await db.get_payment_for_user(payment_id, user_id)
         
         if not payment:
             await callback.answer("❌ Платеж не найден", show_alert=True)
             return
         
-        if payment.user_id != user_id:
-            await callback.answer("❌ Это не ваш платеж", show_alert=True)
-            return
-        
         # Проверяем статус в YooKassa или базе данных (для тестового режима)
         if payment.yookassa_payment_id:
             yookassa_payment = await yookassa_service.get_payment_info(payment.yookassa_payment_id)
@@ -161,12 +162,17 @@ async def check_payment_callback(callback: CallbackQuery, state: FSMContext):
                 status = yookassa_payment.get("status")
                 
                 if status == "succeeded":
-                    # Платеж успешен - активируем подписку
-                    payment.status = PaymentStatus.SUCCEEDED
-                    await db.save_payment(payment)
+                    # Платеж успешен - атомарно отмечаем его в базе
+                    updated_payment = await db.update_payment_status(
+                        payment_id, user_id, PaymentStatus.SUCCEEDED, datetime.now()
+                    )
                     
-                    # Активируем подписку
-                    success = await subscription_service.activate_subscription(user_id, payment)
+                    if updated_payment:
+                        # Активируем подписку
+                        success = await subscription_service.activate_subscription(user_id, updated_payment)
+                    else:
+                        # Платеж уже обработан (webhook'ом или предыдущей проверкой)
+                        success = True
                     
                     if success:
                         await callback.message.edit_text(
@@ -174,7 +180,8 @@ async def check_payment_callback(callback: CallbackQuery, state: FSMContext):
                             "Подписка активирована. Проверьте личные сообщения - туда отправлена ссылка для входа в канал.",
                             parse_mode="HTML"
                         )
-                        payment_logger.payment_succeeded(user_id, payment_id, payment.amount)
+                        if updated_payment:
+                            payment_logger.payment_succeeded(user_id, payment_id, payment.amount)
                     else:
                         await callback.message.edit_text(
                             "⚠️ Оплата прошла, но возникла ошибка активации подписки.\n"
@@ -184,8 +191,7 @@ async def check_payment_callback(callback: CallbackQuery, state: FSMContext):
                     await state.clear()
                     
                 elif status == "canceled":
-                    payment.status = PaymentStatus.CANCELED
-                    await db.save_payment(payment)
+                    await db.update_payment_status(payment_id, user_id, PaymentStatus.CANCELED)
                     
                     await callback.message.edit_text(
                         "❌ Платеж отменен.\n\nВы можете создать новый платеж с помощью команды /pay",
@@ -204,58 +210,76 @@ async def check_payment_callback(callback: CallbackQuery, state: FSMContext):
         else:
             await callback.answer("⏳ Платеж еще не создан в системе", show_alert=True)
             
-    except Exception as e:
-        logger.error(f"Ошибка проверки платежа: {e}")
+    except Exception:
+        logger.exception("Ошибка проверки платежа")
         await callback.answer("❌ Ошибка проверки платежа", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("cancel_payment:"))
 async def cancel_payment_callback(callback: CallbackQuery, state: FSMContext):
     """Обработчик отмены платежа"""
     try:
         payment_id = callback.data.split(":", 1)[1]
         user_id = callback.from_user.id
         
-        # Получаем платеж из базы данных
-        payment = await db.get_payment(payment_id)
+        # Получаем платеж пользователя (чужие платежи не находятся)
+        payment = await db.get_payment_for_user(payment_id, user_id)
+        answer_text = "Платеж отменен"
         
-        if payment and payment.user_id == user_id:
+        if payment:
             # Отменяем платеж в YooKassa если возможно
             if payment.yookassa_payment_id and payment.status == PaymentStatus.PENDING:
                 await yookassa_service.cancel_payment(payment.yookassa_payment_id)
             
-            # Обновляем статус в базе
-            payment.status = PaymentStatus.CANCELED
-            await db.save_payment(payment)
-            
-            await callback.message.edit_text(
-                "❌ Платеж отменен.\n\nВы можете создать новый платеж с помощью команды /pay",
-                reply_markup=get_subscription_keyboard()
+            # Атомарно отменяем только ожидающий платеж (успешный не перезаписываем)
+            canceled_payment = await db.update_payment_status(
+                payment_id, user_id, PaymentStatus.CANCELED,
+                expected_status=PaymentStatus.PENDING
             )
             
-            payment_logger.payment_failed(user_id, payment_id, "user_canceled")
+            if canceled_payment:
+                await callback.message.edit_text(
+                    "❌ Платеж отменен.\n\nВы можете создать новый платеж с помощью команды /pay",
+                    reply_markup=get_subscription_keyboard()
+                )
+                
+                payment_logger.payment_failed(user_id, payment_id, "user_canceled")
+            else:
+                # Платеж уже обработан (оплачен или отменен) webhook'ом или проверкой
+                answer_text = "Платеж уже обработан"
             
         await state.clear()
-        await callback.answer("Платеж отменен")
+        await callback.answer(answer_text)
         
-    except Exception as e:
-        logger.error(f"Ошибка отмены платежа: {e}")
+    except Exception:
+        logger.exception("Ошибка отмены платежа")
         await callback.answer("❌ Ошибка отмены платежа", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("refresh_payment:"))
-async def refresh_payment_callback(callback: CallbackQuery):
+async def refresh_payment_callback(callback: CallbackQuery, state: FSMContext):
     """Обработчик обновления статуса платежа"""
-    try:
-        payment_id = callback.data.split(":", 1)[1]
-        
-        # Перенаправляем на проверку платежа
-        callback.data = f"check_payment:{payment_id}"
-        await check_payment_callback(callback, None)
-        
-    except Exception as e:
-        logger.error(f"Ошибка обновления платежа: {e}")
-        await callback.answer("❌ Ошибка обновления", show_alert=True)
+    payment_id = callback.data.split(":", 1)[1]
+    await _process_payment_check(callback, payment_id, state)
+
+
+# Обработчики callback'ов вида "<префикс>:<payment_id>"
+PAYMENT_CALLBACK_HANDLERS = {
+    "check_payment": check_payment_callback,
+    "cancel_payment": cancel_payment_callback,
+    "refresh_payment": refresh_payment_callback,
+}
+
+
+def _is_payment_callback(data: Optional[str]) -> bool:
+    """Данные вида "<префикс>:<payment_id>" с известным префиксом"""
+    prefix, separator, _ = (data or "").partition(":")
+    return bool(separator) and prefix in PAYMENT_CALLBACK_HANDLERS
+
+
+@router.callback_query(F.data.func(_is_payment_callback))
+async def payment_callback_dispatcher(callback: CallbackQuery, state: FSMContext):
+    """Диспетчер callback'ов платежа по префиксу данных"""
+    prefix = callback.data.partition(":")[0]
+    await PAYMENT_CALLBACK_HANDLERS[prefix](callback, state)
 
 
 def register_handlers(dp):
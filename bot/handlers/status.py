@@ -1,4 +1,6 @@
 import logging
+import asyncio
+from typing import Any, Awaitable, Callable
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
@@ -6,121 +8,201 @@ from aiogram.types import Message, CallbackQuery
 from services.subscription_service import subscription_service
 from services.telegram_service import telegram_service
 from bot.keyboards.inline import get_subscription_keyboard, get_back_keyboard
-from config.settings import CHANNEL_ID
+from config.settings import CHANNEL_ID, SUBSCRIPTION_PRICE
+from utils.helpers import format_dt
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Шаблоны сообщений о статусе подписки (CHANNEL_ID подставляется один раз при импорте)
+ACTIVE_STATUS_TEMPLATE = f"""
+✅ <b>Статус подписки: Активна</b>
 
-@router.message(Command("status"))
-async def status_command(message: Message):
-    """Обработчик команды /status"""
-    try:
-        user_id = message.from_user.id
-        
-        # Получаем статус подписки
-        status_info = await subscription_service.get_subscription_status(user_id)
-        
-        if not status_info:
-            await message.answer(
-                "❌ Информация о подписке не найдена.\n\n"
-                "Возможно, вы еще не использовали команду /start",
-                reply_markup=get_subscription_keyboard()
-            )
-            return
-        
-        # Формируем сообщение о статусе
-        if status_info["is_active"]:
-            status_emoji = "✅"
-            status_text = "Активна"
-            
-            # Проверяем, находится ли пользователь в канале
-            in_channel = await telegram_service.check_user_in_channel(user_id)
-            channel_status = "✅ В канале" if in_channel else "❌ Не в канале"
-            
-            message_text = f"""
-{status_emoji} <b>Статус подписки: {status_text}</b>
-
-📅 Действует до: {status_info['end_date'].strftime('%d.%m.%Y в %H:%M')}
-⏰ Осталось дней: {status_info['days_left']}
+📅 Действует до: {{end_date}}
+⏰ Осталось дней: {{days_left}}
 📢 Канал: {CHANNEL_ID}
-👤 Статус в канале: {channel_status}
+👤 Статус в канале: {{channel_status}}
 
-💰 Всего платежей: {status_info['total_payments']}
-📅 Дата регистрации: {status_info['created_at'].strftime('%d.%m.%Y') if status_info['created_at'] else 'Неизвестно'}
-            """.strip()
-            
-            # Добавляем предупреждение если подписка скоро истечет
-            if status_info['days_left'] <= 3:
-                message_text += f"\n\n⚠️ <b>Внимание!</b> Подписка истекает через {status_info['days_left']} дн. Продлите заранее!"
-                
-        else:
-            status_emoji = "❌"
-            
-            if status_info['status'] == 'expired':
-                status_text = "Истекла"
-                if status_info['end_date']:
-                    message_text = f"""
-{status_emoji} <b>Статус подписки: {status_text}</b>
+💰 Всего платежей: {{total_payments}}
+📅 Дата регистрации: {{created_at}}
+""".strip()
 
-📅 Истекла: {status_info['end_date'].strftime('%d.%m.%Y в %H:%M')}
+EXPIRING_SOON_TEMPLATE = "\n\n⚠️ <b>Внимание!</b> Подписка истекает через {days_left} дн. Продлите заранее!"
+
+EXPIRED_STATUS_TEMPLATE = f"""
+❌ <b>Статус подписки: Истекла</b>
+
+📅 Истекла: {{end_date}}
 📢 Канал: {CHANNEL_ID}
 👤 Доступ: Отсутствует
 
-💰 Всего платежей: {status_info['total_payments']}
+💰 Всего платежей: {{total_payments}}
 
 Используйте /pay для продления подписки
-                    """.strip()
-                else:
-                    message_text = f"""
-{status_emoji} <b>Статус подписки: Отсутствует</b>
+""".strip()
+
+NO_SUBSCRIPTION_TEXT = f"""
+❌ <b>Статус подписки: Отсутствует</b>
 
 📢 Канал: {CHANNEL_ID}
 👤 Доступ: Отсутствует
 
 Используйте /pay для оформления подписки
-                    """.strip()
-                    
-            elif status_info['status'] == 'trial':
-                status_text = "Пробный период"
-                message_text = f"""
-🔶 <b>Статус подписки: {status_text}</b>
-
-📅 Действует до: {status_info['end_date'].strftime('%d.%m.%Y в %H:%M')}
-⏰ Осталось дней: {status_info['days_left']}
+""".strip()
+
+TRIAL_STATUS_TEMPLATE = f"""
+🔶 <b>Статус подписки: Пробный период</b>
+
+📅 Действует до: {{end_date}}
+⏰ Осталось дней: {{days_left}}
 📢 Канал: {CHANNEL_ID}
 
 💡 После окончания пробного периода необходимо оплатить подписку
-                """.strip()
-                
-            elif status_info['status'] == 'suspended':
-                status_text = "Приостановлена"
-                message_text = f"""
-⏸️ <b>Статус подписки: {status_text}</b>
+""".strip()
+
+SUSPENDED_STATUS_TEXT = f"""
+⏸️ <b>Статус подписки: Приостановлена</b>
 
 📢 Канал: {CHANNEL_ID}
 👤 Доступ: Отсутствует
 
 Обратитесь в поддержку для разблокировки
-                """.strip()
-            else:
-                status_text = "Неопределен"
-                message_text = f"""
-❓ <b>Статус подписки: {status_text}</b>
+""".strip()
+
+UNKNOWN_STATUS_TEXT = """
+❓ <b>Статус подписки: Неопределен</b>
 
 Обратитесь в поддержку для уточнения статуса
-                """.strip()
-        
-        await message.answer(
-            message_text,
-            reply_markup=get_subscription_keyboard(),
-            parse_mode="HTML"
+""".strip()
+
+# Текст /info: от запроса зависят только название канала и число участников
+INFO_TEMPLATE = f"""
+ℹ️ <b>Информация о сервисе</b>
+
+📢 <b>Канал:</b> {CHANNEL_ID}
+🏷️ <b>Название:</b> {{channel_title}}
+👥 <b>Участников:</b> {{member_count}}
+
+💰 <b>Стоимость подписки:</b> {int(SUBSCRIPTION_PRICE)} руб/месяц
+⏰ <b>Срок действия:</b> 30 дней
+
+<b>Возможности подписки:</b>
+• Полный доступ к контенту канала
+• Мгновенная активация после оплаты
+• Автоматическое управление доступом
+• Техническая поддержка
+
+<b>Способы оплаты:</b>
+• Банковские карты (Visa, MasterCard, МИР)
+• SberPay, YooMoney
+• Другие способы через ЮKassa
+
+Для оформления подписки используйте команду /pay
+""".strip()
+
+
+def _build_expired_status(status_info: dict, end_date_text: str) -> str:
+    """Сообщение для истекшей (или не оформленной) подписки"""
+    if not status_info['end_date']:
+        return NO_SUBSCRIPTION_TEXT
+    return EXPIRED_STATUS_TEMPLATE.format(
+        end_date=end_date_text,
+        total_payments=status_info['total_payments']
+    )
+
+
+def _build_trial_status(status_info: dict, end_date_text: str) -> str:
+    """Сообщение для пробного периода"""
+    return TRIAL_STATUS_TEMPLATE.format(
+        end_date=end_date_text,
+        days_left=status_info['days_left']
+    )
+
+
+def _build_suspended_status(status_info: dict, end_date_text: str) -> str:
+    """Сообщение для приостановленной подписки"""
+    return SUSPENDED_STATUS_TEXT
+
+
+def _build_unknown_status(status_info: dict, end_date_text: str) -> str:
+    """Сообщение для неизвестного статуса"""
+    return UNKNOWN_STATUS_TEXT
+
+
+# Сообщения для неактивной подписки по статусу
+INACTIVE_STATUS_BUILDERS = {
+    'expired': _build_expired_status,
+    'trial': _build_trial_status,
+    'suspended': _build_suspended_status,
+}
+
+
+async def _send_status(user_id: int, answer: Callable[..., Awaitable[Any]]):
+    """
+    Отправить пользователю сообщение о статусе подписки
+    
+    Args:
+        user_id: ID пользователя
+        answer: Функция отправки ответа (message.answer)
+    """
+    # Статус подписки и членство в канале запрашиваем параллельно
+    status_info, in_channel = await asyncio.gather(
+        subscription_service.get_subscription_status(user_id),
+        telegram_service.check_user_in_channel(user_id),
+        return_exceptions=True
+    )
+    
+    if isinstance(status_info, Exception):
+        raise status_info
+    
+    if not status_info:
+        await answer(
+            "❌ Информация о подписке не найдена.\n\n"
+            "Возможно, вы еще не использовали команду /start",
+            reply_markup=get_subscription_keyboard()
+        )
+        return
+    
+    # Формируем сообщение о статусе
+    end_date = status_info['end_date']
+    end_date_text = format_dt(end_date, sep=" в ") if end_date else ''
+    
+    if status_info["is_active"]:
+        created_at = status_info['created_at']
+        # Ошибку проверки канала считаем отсутствием в канале
+        message_text = ACTIVE_STATUS_TEMPLATE.format(
+            end_date=end_date_text,
+            days_left=status_info['days_left'],
+            channel_status="✅ В канале" if in_channel is True else "❌ Не в канале",
+            total_payments=status_info['total_payments'],
+            created_at=format_dt(created_at, with_time=False) if created_at else 'Неизвестно'
         )
         
-        logger.info(f"Пользователь {user_id} проверил статус подписки: {status_info['status']}")
+        # Добавляем предупреждение если подписка скоро истечет
+        if status_info['days_left'] <= 3:
+            message_text += EXPIRING_SOON_TEMPLATE.format(days_left=status_info['days_left'])
+            
+    else:
+        builder = INACTIVE_STATUS_BUILDERS.get(status_info['status'], _build_unknown_status)
+        message_text = builder(status_info, end_date_text)
+    
+    await answer(
+        message_text,
+        reply_markup=get_subscription_keyboard(),
+        parse_mode="HTML"
+    )
+    
+    logger.info("Пользователь %s проверил статус подписки: %s", user_id, status_info['status'])
+
+
+@router.message(Command("status"))
+async def status_command(message: Message):
+    """Обработчик команды /status"""
+    try:
+        await _send_status(message.from_user.id, message.answer)
         
-    except Exception as e:
-        logger.error(f"Ошибка в обработчике /status: {e}")
+    except Exception:
+        logger.exception("Ошибка в обработчике /status")
         await message.answer(
             "❌ Ошибка получения статуса подписки. Попробуйте позже.",
             reply_markup=get_subscription_keyboard()
@@ -131,14 +213,12 @@ async def status_command(message: Message):
 async def check_status_callback(callback: CallbackQuery):
     """Обработчик кнопки проверки статуса"""
     try:
-        # Имитируем команду /status
-        message = callback.message
-        message.from_user = callback.from_user
-        await status_command(message)
+        # Статус запрашивает пользователь, нажавший кнопку (сообщение отправлено ботом)
+        await _send_status(callback.from_user.id, callback.message.answer)
         await callback.answer("📊 Статус обновлен!")
         
-    except Exception as e:
-        logger.error(f"Ошибка в check_status callback: {e}")
+    except Exception:
+        logger.exception("Ошибка в check_status callback")
         await callback.answer("❌ Ошибка получения статуса", show_alert=True)
 
 
@@ -147,7 +227,7 @@ async def info_command(message: Message):
     """Обработчик команды /info - общая информация"""
     try:
         # Получаем информацию о канале
-        channel_info = await telegram_service.get_channel_info()
+        channel_info = await telegram_service.get_cached_channel_info()
         
         if channel_info:
             member_count = channel_info.get("member_count", "Неизвестно")
@@ -156,29 +236,10 @@ async def info_command(message: Message):
             member_count = "Неизвестно"
             channel_title = "Канал"
         
-        message_text = f"""
-ℹ️ <b>Информация о сервисе</b>
-
-📢 <b>Канал:</b> {CHANNEL_ID}
-🏷️ <b>Название:</b> {channel_title}
-👥 <b>Участников:</b> {member_count}
-
-💰 <b>Стоимость подписки:</b> {int(subscription_service.__dict__.get('subscription_price', 500))} руб/месяц
-⏰ <b>Срок действия:</b> 30 дней
-
-<b>Возможности подписки:</b>
-• Полный доступ к контенту канала
-• Мгновенная активация после оплаты
-• Автоматическое управление доступом
-• Техническая поддержка
-
-<b>Способы оплаты:</b>
-• Банковские карты (Visa, MasterCard, МИР)
-• SberPay, YooMoney
-• Другие способы через ЮKassa
-
-Для оформления подписки используйте команду /pay
-        """.strip()
+        message_text = INFO_TEMPLATE.format(
+            channel_title=channel_title,
+            member_count=member_count
+        )
         
         await message.answer(
             message_text,
@@ -186,10 +247,10 @@ async def info_command(message: Message):
             parse_mode="HTML"
         )
         
-        logger.info(f"Пользователь {message.from_user.id} запросил общую информацию")
+        logger.info("Пользователь %s запросил общую информацию", message.from_user.id)
         
-    except Exception as e:
-        logger.error(f"Ошибка в обработчике /info: {e}")
+    except Exception:
+        logger.exception("Ошибка в обработчике /info")
         await message.answer(
             "❌ Ошибка получения информации. Попробуйте позже.",
             reply_markup=get_subscription_keyboard()
@@ -220,8 +281,8 @@ async def myid_command(message: Message):
             parse_mode="HTML"
         )
         
-    except Exception as e:
-        logger.error(f"Ошибка в обработчике /myid: {e}")
+    except Exception:
+        logger.exception("Ошибка в обработчике /myid")
         await message.answer("❌ Ошибка получения информации")
 
 
@@ -1,59 +1,82 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config.settings import SUBSCRIPTION_PRICE
 
+# Тексты кнопок клавиатуры оплаты (сама клавиатура уникальна для каждого платежа)
+PAY_BUTTON_TEXT = "💳 Оплатить"
+CHECK_PAYMENT_BUTTON_TEXT = "✅ Проверить оплату"
+CANCEL_PAYMENT_BUTTON_TEXT = "❌ Отменить"
+
 
 def get_payment_keyboard(payment_id: str, confirmation_url: str) -> InlineKeyboardMarkup:
     """Клавиатура для оплаты"""
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(
-            text="💳 Оплатить",
+            text=PAY_BUTTON_TEXT,
             url=confirmation_url
         )],
         [InlineKeyboardButton(
-            text="✅ Проверить оплату",
+            text=CHECK_PAYMENT_BUTTON_TEXT,
             callback_data=f"check_payment:{payment_id}"
         )],
         [InlineKeyboardButton(
-            text="❌ Отменить",
+            text=CANCEL_PAYMENT_BUTTON_TEXT,
             callback_data=f"cancel_payment:{payment_id}"
         )]
     ])
 
 
+# Клавиатуры без пользовательских данных не меняются - создаем их один раз
+# при импорте и отдаем один и тот же объект во все сообщения
+_SUBSCRIPTION_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(
+        text="💳 Оплатить подписку",
+        callback_data="pay_subscription"
+    )],
+    [InlineKeyboardButton(
+        text="📊 Статус подписки",
+        callback_data="check_status"
+    )],
+    [InlineKeyboardButton(
+        text="❓ Помощь",
+        callback_data="help"
+    )]
+])
+
+
 def get_subscription_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для управления подпиской"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(
-            text="💳 Оплатить подписку",
-            callback_data="pay_subscription"
-        )],
-        [InlineKeyboardButton(
-            text="📊 Статус подписки",
-            callback_data="check_status"
-        )],
-        [InlineKeyboardButton(
-            text="❓ Помощь",
-            callback_data="help"
-        )]
-    ])
+    return _SUBSCRIPTION_KEYBOARD
+
+
+_ADMIN_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats"),
+        InlineKeyboardButton(text="👥 Пользователи", callback_data="admin_users")
+    ],
+    [
+        InlineKeyboardButton(text="📢 Рассылка", callback_data="admin_broadcast"),
+        InlineKeyboardButton(text="💰 Платежи", callback_data="admin_payments")
+    ],
+    [
+        InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin_settings"),
+        InlineKeyboardButton(text="📝 Логи", callback_data="admin_logs")
+    ]
+])
+
+_ADMIN_STATS_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_stats_force")],
+    *_ADMIN_KEYBOARD.inline_keyboard
+])
 
 
 def get_admin_keyboard() -> InlineKeyboardMarkup:
     """Админская клавиатура"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="📊 Статистика", callback_data="admin_stats"),
-            InlineKeyboardButton(text="👥 Пользователи", callback_data="admin_users")
-        ],
-        [
-            InlineKeyboardButton(text="📢 Рассылка", callback_data="admin_broadcast"),
-            InlineKeyboardButton(text="💰 Платежи", callback_data="admin_payments")
-        ],
-        [
-            InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin_settings"),
-            InlineKeyboardButton(text="📝 Логи", callback_data="admin_logs")
-        ]
-    ])
+    return _ADMIN_KEYBOARD
+
+
+def get_admin_stats_keyboard() -> InlineKeyboardMarkup:
+    """Админская клавиатура для экрана статистики"""
+    return _ADMIN_STATS_KEYBOARD
 
 
 def get_confirmation_keyboard(action: str, data: str = "") -> InlineKeyboardMarkup:
@@ -116,26 +139,29 @@ def get_payment_status_keyboard(payment_id: str) -> InlineKeyboardMarkup:
     ])
 
 
+_HELP_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(
+        text="💳 Как оплатить?",
+        callback_data="help_payment"
+    )],
+    [InlineKeyboardButton(
+        text="🔧 Проблемы с доступом",
+        callback_data="help_access"
+    )],
+    [InlineKeyboardButton(
+        text="💰 Возврат средств",
+        callback_data="help_refund"
+    )],
+    [InlineKeyboardButton(
+        text="📞 Связаться с поддержкой",
+        callback_data="support"
+    )]
+])
+
+
 def get_help_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура помощи"""
-    return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(
-            text="💳 Как оплатить?",
-            callback_data="help_payment"
-        )],
-        [InlineKeyboardButton(
-            text="🔧 Проблемы с доступом",
-            callback_data="help_access"
-        )],
-        [InlineKeyboardButton(
-            text="💰 Возврат средств",
-            callback_data="help_refund"
-        )],
-        [InlineKeyboardButton(
-            text="📞 Связаться с поддержкой",
-            callback_data="support"
-        )]
-    ])
+    return _HELP_KEYBOARD
 
 
 def get_back_keyboard(callback_data: str = "start") -> InlineKeyboardMarkup:
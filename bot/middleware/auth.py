@@ -1,5 +1,7 @@
 import logging
-from typing import Callable, Dict, Any, Awaitable
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Awaitable, Optional
 from aiogram import BaseMiddleware
 from aiogram.filters import BaseFilter
 from aiogram.types import TelegramObject, Message, CallbackQuery
@@ -28,30 +30,34 @@ class AdminMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        # Получаем ID пользователя
-        user_id = None
-        if isinstance(event, (Message, CallbackQuery)):
-            user_id = event.from_user.id
+        # События без пользователя (посты канала и т.п.) до админских обработчиков не доходят
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return
+        
+        user_id = user.id
+        is_callback = isinstance(event, CallbackQuery)
         
         # Проверяем права администратора
         if user_id not in ADMIN_IDS:
-            logger.warning(f"Попытка доступа к админским функциям от пользователя {user_id}")
+            logger.warning("Попытка доступа к админским функциям от пользователя %s", user_id)
             
-            if isinstance(event, Message):
-                await event.answer("❌ У вас нет прав администратора")
-            elif isinstance(event, CallbackQuery):
+            if is_callback:
                 await event.answer("❌ У вас нет прав администратора", show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer("❌ У вас нет прав администратора")
             
             return
         
-        # Логируем админские действия
-        action = "unknown"
-        if isinstance(event, Message) and event.text:
-            action = event.text.split()[0]
-        elif isinstance(event, CallbackQuery):
-            action = event.data
-        
-        logger.info(f"Админ {user_id} выполняет действие: {action}")
+        # Логируем админские действия (действие вычисляем, только если INFO включен)
+        if logger.isEnabledFor(logging.INFO):
+            action = "unknown"
+            if is_callback:
+                action = event.data
+            elif isinstance(event, Message) and event.text:
+                action = event.text.split()[0]
+            
+            logger.info("Админ %s выполняет действие: %s", user_id, action)
         
         # Передаем управление дальше
         return await handler(event, data)
@@ -60,6 +66,36 @@ class AdminMiddleware(BaseMiddleware):
 class UserTrackingMiddleware(BaseMiddleware):
     """Middleware для отслеживания активности пользователей"""
     
+    # Максимум пользователей в кэше user_info
+    MAX_CACHED_USERS = 50000
+    
+    def __init__(self):
+        # {user_id: ((username, first_name, last_name), user_info)}, от давних к недавним
+        self._cache: "OrderedDict[int, tuple]" = OrderedDict()
+    
+    def _get_user_info(self, user) -> Dict[str, Any]:
+        """Информация о пользователе (пересобирается только при смене имени)"""
+        signature = (user.username, user.first_name, user.last_name)
+        cached = self._cache.get(user.id)
+        
+        if cached is not None and cached[0] == signature:
+            self._cache.move_to_end(user.id)
+            return cached[1]
+        
+        user_info = {
+            'id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'is_admin': user.id in ADMIN_IDS
+        }
+        self._cache[user.id] = (signature, user_info)
+        self._cache.move_to_end(user.id)
+        if len(self._cache) > self.MAX_CACHED_USERS:
+            self._cache.popitem(last=False)
+        
+        return user_info
+    
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -72,26 +108,46 @@ class UserTrackingMiddleware(BaseMiddleware):
             
             # Логируем активность
             action = "message" if isinstance(event, Message) else "callback"
-            logger.info(f"User {user.id} ({user.username}) performed {action}")
+            logger.info("User %s (%s) performed %s", user.id, user.username, action)
             
             # Добавляем информацию о пользователе в данные
-            data['user_info'] = {
-                'id': user.id,
-                'username': user.username,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'is_admin': user.id in ADMIN_IDS
-            }
+            data['user_info'] = self._get_user_info(user)
         
         return await handler(event, data)
 
 
+# Ответы на слишком частые события
+SPAM_MESSAGE_TEXT = "🚫 Не так быстро! Подождите немного."
+SPAM_CALLBACK_TEXT = "🚫 Не так быстро!"
+
+
 class AntiSpamMiddleware(BaseMiddleware):
     """Middleware для защиты от спама"""
     
-    def __init__(self, rate_limit: int = 1):
+    # Максимум отслеживаемых пользователей (защита от роста памяти)
+    MAX_TRACKED_USERS = 50000
+    
+    def __init__(self, rate_limit: float = 1, callback_rate_limit: Optional[float] = None):
+        """
+        Args:
+            rate_limit: Минимальный интервал между событиями пользователя (сек)
+            callback_rate_limit: Интервал для нажатий кнопок (по умолчанию - rate_limit)
+        """
         self.rate_limit = rate_limit
-        self.users = {}  # {user_id: last_message_time}
+        self.callback_rate_limit = rate_limit if callback_rate_limit is None else callback_rate_limit
+        # Записи старше максимального интервала ни на что не влияют
+        self._max_rate_limit = max(self.rate_limit, self.callback_rate_limit)
+        # {user_id: last_event_time}, упорядочено от самых старых к новым
+        self.users: "OrderedDict[int, float]" = OrderedDict()
+    
+    def _evict_stale(self, current_time: float):
+        """Удалить записи, которые уже не влияют на ограничение"""
+        users = self.users
+        while users:
+            _, last_time = next(iter(users.items()))
+            if current_time - last_time < self._max_rate_limit and len(users) < self.MAX_TRACKED_USERS:
+                break
+            users.popitem(last=False)
     
     async def __call__(
         self,
@@ -99,35 +155,47 @@ class AntiSpamMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        import time
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
         
-        if isinstance(event, (Message, CallbackQuery)):
-            user_id = event.from_user.id
-            current_time = time.time()
-            
-            # Проверяем время последнего сообщения
-            if user_id in self.users:
-                time_diff = current_time - self.users[user_id]
-                if time_diff < self.rate_limit:
-                    # Слишком частые сообщения
-                    if isinstance(event, Message):
-                        await event.answer("🚫 Не так быстро! Подождите немного.")
-                    elif isinstance(event, CallbackQuery):
-                        await event.answer("🚫 Не так быстро!", show_alert=True)
-                    return
-            
-            # Обновляем время последнего сообщения
-            self.users[user_id] = current_time
+        user_id = user.id
+        current_time = time.monotonic()
+        
+        # Старые записи лежат в начале - чистим их, пока не встретим свежую
+        self._evict_stale(current_time)
+        
+        # Сообщения и нажатия кнопок делят одно окно, чтобы их нельзя было чередовать
+        is_callback = isinstance(event, CallbackQuery)
+        rate_limit = self.callback_rate_limit if is_callback else self.rate_limit
+        
+        # Проверяем время последнего события
+        last_time = self.users.get(user_id)
+        if last_time is not None and current_time - last_time < rate_limit:
+            # Слишком частые сообщения
+            if is_callback:
+                await event.answer(SPAM_CALLBACK_TEXT, show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer(SPAM_MESSAGE_TEXT)
+            return
+        
+        # Обновляем время последнего события и переносим запись в конец
+        self.users[user_id] = current_time
+        self.users.move_to_end(user_id)
         
         return await handler(event, data)
 
 
 def setup_middlewares(dp):
     """Настройка middleware"""
+    # Один экземпляр на сообщения и callback'и - общее состояние на пользователя
+    tracker = UserTrackingMiddleware()
+    anti_spam = AntiSpamMiddleware(rate_limit=1, callback_rate_limit=0.5)
+    
     # Middleware для отслеживания пользователей (применяется ко всем событиям)
-    dp.message.middleware(UserTrackingMiddleware())
-    dp.callback_query.middleware(UserTrackingMiddleware())
+    dp.message.middleware(tracker)
+    dp.callback_query.middleware(tracker)
     
-    # Anti-spam middleware (1 сообщение в секунду)
-    dp.message.middleware(AntiSpamMiddleware(rate_limit=1))
-    dp.callback_query.middleware(AntiSpamMiddleware(rate_limit=0.5))
\ No newline at end of file
+    # Anti-spam middleware (1 сообщение в секунду, 2 нажатия кнопок в секунду)
+    dp.message.middleware(anti_spam)
+    dp.callback_query.middleware(anti_spam)
\ No newline at end of file
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    SendAnimation,
+    SendAudio,
+    SendDocument,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendVideo,
+    SendVoice,
+    TelegramMethod,
+)
+from aiogram.methods.base import Response, TelegramType
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+# Методы, публикующие сообщение в чат (для них действует лимит групп и каналов)
+MESSAGE_METHODS = (
+    SendMessage, SendPhoto, SendVideo, SendDocument, SendAnimation,
+    SendAudio, SendVoice, SendMediaGroup, ForwardMessage, CopyMessage,
+)
+
+# Методы, отправляющие или меняющие сообщения (для них действует лимит на чат).
+# Служебные запросы к каналу (getChatMember, unbanChatMember, createChatInviteLink)
+# ограничены только общим лимитом
+CHAT_METHODS = MESSAGE_METHODS + (
+    EditMessageText, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup,
+)
+
+
+class TokenBucket:
+    """Асинхронный ограничитель частоты: не более rate вызовов за period секунд"""
+    
+    def __init__(self, rate: int, period: float = 1.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        """Пополнение токенов за прошедшее время"""
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._tokens = min(self.rate, self._tokens + elapsed * self.rate / self.period)
+        self._updated = now
+    
+    @property
+    def is_idle(self) -> bool:
+        """Ведро полностью заполнено (давно не использовалось)"""
+        self._refill()
+        return self._tokens >= self.rate
+    
+    async def acquire(self):
+        """Дождаться свободного токена"""
+        # Токен резервируется сразу (баланс может уйти в минус), а ожидание
+        # идет без блокировки: вызовы выходят по FIFO и не держат друг друга
+        self._refill()
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens * self.period / self.rate)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Middleware сессии бота для ограничения исходящих запросов к Telegram API
+    
+    Все вызовы bot.<method> проходят через общий лимит (30 запросов/сек).
+    Отправка и редактирование сообщений дополнительно ограничены лимитом
+    на чат, а сообщения в группы и каналы - лимитом Telegram для групп
+    (20 в минуту). При ответе 429 (RetryAfter)
+    запрос повторяется после указанной Telegram паузы.
+    """
+    
+    # Сколько ведер чатов держать до очистки неиспользуемых
+    MAX_CHAT_BUCKETS = 10000
+    
+    def __init__(
+        self,
+        overall_rate: int = 30,
+        per_chat_rate: int = 3,
+        per_chat_period: float = 3.0,
+        group_rate: int = 20,
+        group_period: float = 60.0,
+        max_retries: int = 3
+    ):
+        self.overall_limiter = TokenBucket(overall_rate, 1.0)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_period = per_chat_period
+        self.group_rate = group_rate
+        self.group_period = group_period
+        self.max_retries = max_retries
+        self.chat_limiters: Dict[int, TokenBucket] = {}
+        # Групп и каналов у бота единицы - эти ведра не очищаются
+        self.group_limiters: Dict[int, TokenBucket] = {}
+    
+    def _get_chat_limiter(self, chat_id) -> TokenBucket:
+        """Получить ограничитель для чата"""
+        limiter = self.chat_limiters.get(chat_id)
+        if limiter is None:
+            if len(self.chat_limiters) >= self.MAX_CHAT_BUCKETS:
+                self._cleanup_chat_limiters()
+            limiter = TokenBucket(self.per_chat_rate, self.per_chat_period)
+            self.chat_limiters[chat_id] = limiter
+        return limiter
+    
+    def _cleanup_chat_limiters(self):
+        """Удалить ограничители чатов, которые давно не использовались"""
+        idle_chats = [chat_id for chat_id, limiter in self.chat_limiters.items() if limiter.is_idle]
+        for chat_id in idle_chats:
+            del self.chat_limiters[chat_id]
+    
+    def _get_group_limiter(self, chat_id) -> TokenBucket:
+        """Получить ограничитель сообщений для группы или канала"""
+        limiter = self.group_limiters.get(chat_id)
+        if limiter is None:
+            limiter = TokenBucket(self.group_rate, self.group_period)
+            self.group_limiters[chat_id] = limiter
+        return limiter
+    
+    @staticmethod
+    def _is_group_chat(chat_id) -> bool:
+        """Группа или канал: отрицательный ID или @username (у личных чатов ID положительный)"""
+        if isinstance(chat_id, str):
+            return chat_id.startswith("@") or chat_id.startswith("-")
+        return chat_id < 0
+    
+    async def _acquire(self, chat_id: Optional[int], method: TelegramMethod):
+        """Дождаться разрешения на отправку запроса"""
+        if chat_id is not None and isinstance(method, CHAT_METHODS):
+            if isinstance(method, MESSAGE_METHODS) and self._is_group_chat(chat_id):
+                await self._get_group_limiter(chat_id).acquire()
+            await self._get_chat_limiter(chat_id).acquire()
+        
+        # Общий токен берем последним, чтобы не расходовать его на ожидание в очереди чата
+        await self.overall_limiter.acquire()
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, method)
+            
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                
+                logger.warning(
+                    "Telegram RetryAfter для %s: повтор через %sс (попытка %s/%s)",
+                    type(method).__name__, e.retry_after, attempt + 1, self.max_retries
+                )
+                await asyncio.sleep(e.retry_after)
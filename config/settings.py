@@ -11,18 +11,21 @@ BASE_DIR = Path(__file__).parent.parent
 # Telegram Bot настройки
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 CHANNEL_ID = os.getenv('CHANNEL_ID', '@your_channel')
-ADMIN_IDS = []
+# frozenset: проверка "user_id in ADMIN_IDS" выполняется на каждое событие
+ADMIN_IDS = frozenset()
 if os.getenv('ADMIN_IDS'):
     try:
-        ADMIN_IDS = [int(x.strip()) for x in os.getenv('ADMIN_IDS').split(',') if x.strip()]
+        ADMIN_IDS = frozenset(int(x.strip()) for x in os.getenv('ADMIN_IDS').split(',') if x.strip())
     except ValueError:
         print("❌ Ошибка в ADMIN_IDS. Используйте формат: 123456789,987654321")
-        ADMIN_IDS = []
+        ADMIN_IDS = frozenset()
 
 # ЮKassa настройки  
 YOOKASSA_SHOP_ID = os.getenv('YOOKASSA_SHOP_ID')
 YOOKASSA_SECRET_KEY = os.getenv('YOOKASSA_SECRET_KEY')
 YOOKASSA_BASE_URL = 'https://api.yookassa.ru/v3'
+# Максимум одновременных соединений с YooKassa API
+YOOKASSA_POOL_SIZE = int(os.getenv('YOOKASSA_POOL_SIZE', '64'))
 
 # Подписка настройки
 SUBSCRIPTION_PRICE = float(os.getenv('SUBSCRIPTION_PRICE', '500'))
@@ -42,9 +45,12 @@ WEBHOOK_URL = f"https://{WEBHOOK_HOST}{WEBHOOK_PATH}"
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_DIR = BASE_DIR / 'logs'
 
-# Создание директорий
-LOG_DIR.mkdir(exist_ok=True)
-DATABASE_PATH.parent.mkdir(exist_ok=True)
+
+def ensure_dirs():
+    """Создание рабочих директорий (вызывается один раз при запуске)"""
+    LOG_DIR.mkdir(exist_ok=True)
+    DATABASE_PATH.parent.mkdir(exist_ok=True)
+
 
 # Проверка обязательных переменных
 if not TELEGRAM_BOT_TOKEN:
@@ -96,4 +102,85 @@ MESSAGES = {
 
 Попробуйте еще раз или обратитесь в поддержку.
     """.strip()
-}
\ No newline at end of file
+}
+
+# Приветствие зависит только от настроек - форматируем его один раз при загрузке
+WELCOME_MESSAGE = MESSAGES['welcome'].format(
+    channel_id=CHANNEL_ID,
+    price=int(SUBSCRIPTION_PRICE)
+)
+
+# Тексты поддержки и справки (общие для команд бота и уведомлений)
+SUPPORT_TEXT = """
+📞 <b>Поддержка</b>
+
+Если у вас возникли проблемы, обратитесь к нашей службе поддержки:
+
+📧 Email: support@example.com
+💬 Telegram: @support_bot
+🕐 Время работы: 9:00-18:00 (МСК)
+
+Мы поможем решить любые вопросы!
+""".strip()
+
+HELP_TEXTS = {
+    "payment": """
+💳 <b>Как оплатить подписку?</b>
+
+1. Используйте команду /pay
+2. Нажмите кнопку "💳 Оплатить"
+3. Выберите способ оплаты
+4. Следуйте инструкциям
+5. После оплаты нажмите "✅ Проверить оплату"
+
+Доступ откроется автоматически!
+""".strip(),
+    
+    "access": """
+🔧 <b>Проблемы с доступом?</b>
+
+Возможные причины:
+• Подписка истекла
+• Ссылка-приглашение устарела
+• Вы покинули канал
+
+Решения:
+• Проверьте статус: /status
+• Продлите подписку: /pay
+• Обратитесь в поддержку
+
+Мы поможем!
+""".strip(),
+    
+    "refund": """
+💰 <b>Возврат средств</b>
+
+Условия возврата:
+• В течение 14 дней с момента оплаты
+• При технических проблемах
+• По решению администрации
+
+Для возврата обратитесь в поддержку с указанием:
+• ID платежа
+• Причины возврата
+• Контактных данных
+""".strip(),
+    
+    "general": """
+❓ <b>Справка по боту</b>
+
+<b>Основные команды:</b>
+/start - Начало работы
+/pay - Оплата подписки
+/status - Статус подписки
+/help - Эта справка
+
+<b>Как это работает:</b>
+1. Оплачиваете подписку
+2. Получаете ссылку на канал
+3. Присоединяетесь к каналу
+4. Наслаждаетесь контентом!
+
+<b>Поддержка:</b> @support_bot
+""".strip()
+}
@@ -1,31 +1,208 @@
 import aiosqlite
+import ast
+import asyncio
+import calendar
 import logging
+import os
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from pathlib import Path
 
 from config.settings import DATABASE_PATH
 from database.models import User, Payment, PaymentStatus, SubscriptionStatus
+from utils.cache import TTLCache
+from utils.helpers import safe_json_dumps, safe_json_loads
 
 logger = logging.getLogger(__name__)
 
+# Максимальное количество соединений только для чтения
+READER_POOL_SIZE = os.cpu_count() or 1
+
+# Размер кэша подготовленных выражений sqlite3 на соединение: повторный
+# запрос с тем же текстом SQL не разбирается заново, а только связывает параметры
+STATEMENT_CACHE_SIZE = 256
+
+# Кэш строк users/payments: размер и время жизни записи в секундах.
+# Все записи в базу идут через этот процесс, поэтому кэш сбрасывается при записи
+ROW_CACHE_SIZE = 512
+ROW_CACHE_TTL = 60
+
+# Прямые ссылки для разбора строк: поиск члена Enum по словарю и
+# fromisoformat без поиска атрибута на каждую колонку каждой строки
+_SUBSCRIPTION_STATUS_MAP = SubscriptionStatus._value2member_map_
+_PAYMENT_STATUS_MAP = PaymentStatus._value2member_map_
+_FROMISO = datetime.fromisoformat
+
+# Явные списки колонок для выборок (ровно те, что нужны моделям).
+# Строки читаются обычными кортежами, поэтому порядок колонок
+# должен совпадать с порядком полей User и Payment
+USER_COLUMNS = (
+    "user_id, username, first_name, last_name, subscription_end, subscription_status, "
+    "yookassa_customer_id, is_active, total_payments, created_at, updated_at"
+)
+PAYMENT_COLUMNS = (
+    "id, user_id, payment_id, yookassa_payment_id, amount, currency, status, description, "
+    "confirmation_url, metadata, created_at, updated_at, completed_at"
+)
+
+# UPSERT обновляет строку на месте: в отличие от INSERT OR REPLACE не удаляет
+# ее (id и created_at сохраняются, внешние ключи не перепроверяются)
+UPSERT_USER_SQL = """
+    INSERT INTO users 
+    (user_id, username, first_name, last_name, subscription_end, 
+     subscription_end_ts, subscription_status, yookassa_customer_id, 
+     is_active, total_payments, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        username = excluded.username,
+        first_name = excluded.first_name,
+        last_name = excluded.last_name,
+        subscription_end = excluded.subscription_end,
+        subscription_end_ts = excluded.subscription_end_ts,
+        subscription_status = excluded.subscription_status,
+        yookassa_customer_id = excluded.yookassa_customer_id,
+        is_active = excluded.is_active,
+        total_payments = excluded.total_payments,
+        updated_at = excluded.updated_at
+"""
+
+UPSERT_PAYMENT_SQL = """
+    INSERT INTO payments 
+    (user_id, payment_id, yookassa_payment_id, amount, currency, 
+     status, description, confirmation_url, metadata, 
+     updated_at, completed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(payment_id) DO UPDATE SET
+        user_id = excluded.user_id,
+        yookassa_payment_id = excluded.yookassa_payment_id,
+        amount = excluded.amount,
+        currency = excluded.currency,
+        status = excluded.status,
+        description = excluded.description,
+        confirmation_url = excluded.confirmation_url,
+        metadata = excluded.metadata,
+        updated_at = excluded.updated_at,
+        completed_at = excluded.completed_at
+"""
+
 
 class Database:
     """Класс для работы с базой данных"""
     
     def __init__(self, db_path: str = None):
         self.db_path = db_path or DATABASE_PATH
+        # Долгоживущие соединения на процесс: не тратим время на открытие
+        # файла при каждом запросе и сохраняем кэш страниц SQLite.
+        # Все записи идут через одно соединение (SQLite допускает одного
+        # писателя), чтения - через пул соединений только для чтения,
+        # которые в режиме WAL работают параллельно с записью
+        self._writer: Optional[aiosqlite.Connection] = None
+        # Запись на общем соединении сериализуется: иначе команды других
+        # корутин попадут внутрь чужой явной транзакции
+        self._write_lock = asyncio.Lock()
+        self._readers: Optional[asyncio.Queue] = None
+        self._readers_opened = 0
+        # Хранятся неизменяемые строки, а не модели: вызывающий код может
+        # менять полученный User/Payment, не затрагивая кэш
+        self._user_rows = TTLCache(ttl=ROW_CACHE_TTL, maxsize=ROW_CACHE_SIZE)
+        self._payment_rows = TTLCache(ttl=ROW_CACHE_TTL, maxsize=ROW_CACHE_SIZE)
+        # Увеличивается при каждой записи: чтение, начатое до записи,
+        # не должно положить в кэш устаревшую строку
+        self._cache_generation = 0
+        
+    async def _get_connection(self) -> aiosqlite.Connection:
+        """Получение соединения для записи (открывается при первом обращении)"""
+        if self._writer is None:
+            # isolation_level=None: каждая команда коммитится сама,
+            # транзакции из нескольких команд открываются явно через BEGIN IMMEDIATE
+            conn = await aiosqlite.connect(
+                self.db_path,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            await self._apply_pragmas(conn)
+            self._writer = conn
+        return self._writer
+    
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Явная транзакция на соединении для записи (BEGIN IMMEDIATE ... COMMIT)"""
+        db = await self._get_connection()
+        async with self._write_lock:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                await db.execute("COMMIT")
+            except BaseException:
+                await db.execute("ROLLBACK")
+                raise
+    
+    @asynccontextmanager
+    async def _acquire_reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Взять соединение только для чтения из пула (пул растет по мере нужды)"""
+        # Файл базы и WAL создаются соединением для записи
+        await self._get_connection()
         
-    async def _get_connection(self):
-        """Получение соединения с базой данных"""
-        return aiosqlite.connect(self.db_path)
+        if self._readers is None:
+            self._readers = asyncio.Queue()
+        pool = self._readers
+        
+        if pool.empty() and self._readers_opened < READER_POOL_SIZE:
+            self._readers_opened += 1
+            try:
+                conn = await aiosqlite.connect(
+                    f"file:{self.db_path}?mode=ro",
+                    uri=True,
+                    cached_statements=STATEMENT_CACHE_SIZE
+                )
+                await self._apply_pragmas(conn, readonly=True)
+            except Exception:
+                self._readers_opened -= 1
+                raise
+        else:
+            conn = await pool.get()
+        
+        try:
+            yield conn
+        finally:
+            # Пул мог быть закрыт (close) во время чтения - тогда закрываем соединение
+            if self._readers is pool:
+                pool.put_nowait(conn)
+            else:
+                await conn.close()
+    
+    @staticmethod
+    async def _apply_pragmas(conn: aiosqlite.Connection, readonly: bool = False):
+        """Настройки SQLite для соединения (выполняются один раз при открытии)"""
+        if not readonly:
+            # WAL: чтение не блокируется записью; NORMAL в режиме WAL безопасен
+            # и не делает fsync на каждый коммит
+            await conn.execute("PRAGMA journal_mode = WAL")
+            await conn.execute("PRAGMA synchronous = NORMAL")
+            # Включаем поддержку внешних ключей
+            await conn.execute("PRAGMA foreign_keys = ON")
+        # Ждем освобождения блокировки вместо мгновенной ошибки SQLITE_BUSY
+        await conn.execute("PRAGMA busy_timeout = 5000")
+        # Кэш страниц ~20 МБ (отрицательное значение - размер в КБ)
+        await conn.execute("PRAGMA cache_size = -20000")
+        await conn.execute("PRAGMA temp_store = MEMORY")
+    
+    async def close(self):
+        """Закрытие всех соединений с базой данных"""
+        if self._readers is not None:
+            while not self._readers.empty():
+                await self._readers.get_nowait().close()
+            self._readers = None
+            self._readers_opened = 0
+        
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
         
     async def init_database(self):
         """Инициализация базы данных"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Включаем поддержку внешних ключей
-            await db.execute("PRAGMA foreign_keys = ON")
-            
+        async with self._transaction() as db:
             # Создание таблицы пользователей
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -34,6 +211,7 @@ class Database:
                     first_name TEXT,
                     last_name TEXT,
                     subscription_end TIMESTAMP,
+                    subscription_end_ts INTEGER,
                     subscription_status TEXT DEFAULT 'expired',
                     yookassa_customer_id TEXT,
                     is_active BOOLEAN DEFAULT 1,
@@ -93,153 +271,367 @@ class Database:
                 )
             """)
             
+            # Миграция баз, созданных до появления subscription_end_ts
+            async with db.execute("PRAGMA table_info(users)") as cursor:
+                user_columns = {row[1] for row in await cursor.fetchall()}
+            if 'subscription_end_ts' not in user_columns:
+                await db.execute("ALTER TABLE users ADD COLUMN subscription_end_ts INTEGER")
+                await db.execute("""
+                    UPDATE users 
+                    SET subscription_end_ts = CAST(strftime('%s', subscription_end) AS INTEGER)
+                    WHERE subscription_end IS NOT NULL
+                """)
+            
             # Создание индексов для оптимизации
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_subscription_end ON users(subscription_end)")
+            # (статус и is_active впереди, дата последней: истекшие подписки
+            # выбираются поиском по индексу, а не фильтрацией всех активных)
+            await db.execute("DROP INDEX IF EXISTS idx_users_subscription_end")
+            await db.execute("DROP INDEX IF EXISTS idx_users_active_end")
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_users_active_end_ts "
+                "ON users(subscription_status, is_active, subscription_end_ts)"
+            )
             await db.execute("CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status)")
             await db.execute("CREATE INDEX IF NOT EXISTS idx_payments_user_id ON payments(user_id)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments(created_at)")
             
-            await db.commit()
-            logger.info("База данных инициализирована успешно")
+            # Статистика для планировщика запросов
+            await db.execute("ANALYZE")
+        
+        logger.info("База данных инициализирована успешно")
     
     async def get_user(self, user_id: int) -> Optional[User]:
         """Получить пользователя по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM users WHERE user_id = ?", (user_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                
-                if row:
-                    return User(
-                        user_id=row['user_id'],
-                        username=row['username'],
-                        first_name=row['first_name'],
-                        last_name=row['last_name'],
-                        subscription_end=datetime.fromisoformat(row['subscription_end']) if row['subscription_end'] else None,
-                        subscription_status=SubscriptionStatus(row['subscription_status']),
-                        yookassa_customer_id=row['yookassa_customer_id'],
-                        is_active=bool(row['is_active']),
-                        total_payments=row['total_payments'],
-                        created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                        updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
-                    )
-                return None
+        row = self._user_rows.get(user_id)
+        if row is None:
+            generation = self._cache_generation
+            async with self._acquire_reader() as db:
+                async with db.execute(
+                    f"SELECT {USER_COLUMNS} FROM users WHERE user_id = ?", (user_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+            
+            if row and generation == self._cache_generation:
+                self._user_rows.set(user_id, row)
+        
+        return self._row_to_user(row) if row else None
     
     async def save_user(self, user: User) -> bool:
         """Сохранить пользователя"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                user.updated_at = datetime.now()
-                
-                await db.execute("""
-                    INSERT OR REPLACE INTO users 
-                    (user_id, username, first_name, last_name, subscription_end, 
-                     subscription_status, yookassa_customer_id, is_active, 
-                     total_payments, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 
-                           COALESCE((SELECT created_at FROM users WHERE user_id = ?), CURRENT_TIMESTAMP), 
-                           ?)
-                """, (
-                    user.user_id, user.username, user.first_name, user.last_name,
-                    user.subscription_end.isoformat() if user.subscription_end else None,
-                    user.subscription_status.value, user.yookassa_customer_id,
-                    user.is_active, user.total_payments, user.user_id,
-                    user.updated_at.isoformat()
-                ))
-                
-                await db.commit()
-                logger.info(f"Пользователь {user.user_id} сохранен")
-                return True
-                
+            db = await self._get_connection()
+            user.updated_at = datetime.now()
+            
+            async with self._write_lock:
+                await db.execute(UPSERT_USER_SQL, self._user_params(user))
+            self._invalidate_users([user.user_id])
+            
+            logger.debug("Пользователь %s сохранен", user.user_id)
+            return True
+            
         except Exception as e:
-            logger.error(f"Ошибка сохранения пользователя {user.user_id}: {e}")
+            logger.error("Ошибка сохранения пользователя %s: %s", user.user_id, e)
             return False
     
     async def get_expired_users(self) -> List[User]:
         """Получить пользователей с истекшей подпиской"""
-        users = []
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM users 
-                WHERE subscription_end < ? 
+        async with self._acquire_reader() as db:
+            async with db.execute(f"""
+                SELECT {USER_COLUMNS} FROM users 
+                WHERE subscription_end_ts < ? 
+                AND subscription_status = 'active'
+                AND is_active = 1
+            """, (_to_epoch(datetime.now()),)) as cursor:
+                # Одна выборка целиком: async for по курсору aiosqlite
+                # ходит в поток базы за каждой строкой
+                rows = await cursor.fetchall()
+        
+        return list(map(self._row_to_user, rows))
+    
+    async def expire_due_users(self) -> List[User]:
+        """
+        Деактивировать всех пользователей с истекшей подпиской одним запросом
+        
+        Returns:
+            Список деактивированных пользователей (уже в новом статусе)
+        """
+        now = datetime.now()
+        db = await self._get_connection()
+        async with self._write_lock:
+            async with db.execute(f"""
+                UPDATE users 
+                SET subscription_status = 'expired', 
+                    is_active = 0, 
+                    updated_at = ?
+                WHERE subscription_end_ts < ? 
                 AND subscription_status = 'active'
                 AND is_active = 1
-            """, (datetime.now().isoformat(),)) as cursor:
-                
-                async for row in cursor:
-                    users.append(User(
-                        user_id=row['user_id'],
-                        username=row['username'],
-                        first_name=row['first_name'],
-                        last_name=row['last_name'],
-                        subscription_end=datetime.fromisoformat(row['subscription_end']) if row['subscription_end'] else None,
-                        subscription_status=SubscriptionStatus(row['subscription_status']),
-                        yookassa_customer_id=row['yookassa_customer_id'],
-                        is_active=bool(row['is_active']),
-                        total_payments=row['total_payments']
-                    ))
-        
-        return users
+                RETURNING {USER_COLUMNS}
+            """, (now.isoformat(), _to_epoch(now))) as cursor:
+                rows = await cursor.fetchall()
+        
+        self._invalidate_users(row[0] for row in rows)
+        return [self._row_to_user(row) for row in rows]
+    
+    async def iter_active_user_ids(self, batch_size: int = 500) -> AsyncIterator[int]:
+        """
+        Потоковое получение ID пользователей с активной подпиской
+        
+        Выборка идет страницами по user_id, чтобы не держать открытым
+        курсор (и соединение из пула чтения) на время долгой обработки.
+        """
+        last_user_id = 0
+        while True:
+            async with self._acquire_reader() as db:
+                async with db.execute("""
+                    SELECT user_id FROM users 
+                    WHERE subscription_status = 'active'
+                    AND is_active = 1
+                    AND user_id > ?
+                    ORDER BY user_id
+                    LIMIT ?
+                """, (last_user_id, batch_size)) as cursor:
+                    rows = await cursor.fetchall()
+            
+            for row in rows:
+                yield row[0]
+            
+            if len(rows) < batch_size:
+                return
+            last_user_id = rows[-1][0]
+    
+    async def count_active_users(self) -> int:
+        """Количество пользователей с активной подпиской"""
+        async with self._acquire_reader() as db:
+            async with db.execute("""
+                SELECT COUNT(*) FROM users 
+                WHERE subscription_status = 'active'
+                AND is_active = 1
+            """) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else 0
+    
+    async def count_users_by_status(self) -> Dict[str, int]:
+        """Количество пользователей по статусам подписки (одним GROUP BY по индексу)"""
+        async with self._acquire_reader() as db:
+            async with db.execute("""
+                SELECT subscription_status, COUNT(*) FROM users
+                GROUP BY subscription_status
+            """) as cursor:
+                return dict(await cursor.fetchall())
+    
+    async def get_payment_stats(self, days: int) -> Tuple[float, int, int]:
+        """
+        Статистика платежей за последние days дней одним запросом
+        
+        Returns:
+            (сумма успешных платежей, число успешных, число неуспешных/отмененных)
+        """
+        async with self._acquire_reader() as db:
+            # created_at заполняется CURRENT_TIMESTAMP (UTC) - границу считаем так же
+            async with db.execute("""
+                SELECT
+                    COALESCE(SUM(CASE WHEN status = 'succeeded' THEN amount END), 0),
+                    COUNT(CASE WHEN status = 'succeeded' THEN 1 END),
+                    COUNT(CASE WHEN status IN ('failed', 'canceled') THEN 1 END)
+                FROM payments
+                WHERE created_at >= datetime('now', ?)
+            """, (f"-{days} days",)) as cursor:
+                total, succeeded, failed = await cursor.fetchone()
+                return float(total), succeeded, failed
     
     async def save_payment(self, payment: Payment) -> bool:
         """Сохранить платеж"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                payment.updated_at = datetime.now()
-                
-                await db.execute("""
-                    INSERT OR REPLACE INTO payments 
-                    (user_id, payment_id, yookassa_payment_id, amount, currency, 
-                     status, description, confirmation_url, metadata, 
-                     created_at, updated_at, completed_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 
-                           COALESCE((SELECT created_at FROM payments WHERE payment_id = ?), CURRENT_TIMESTAMP),
-                           ?, ?)
-                """, (
-                    payment.user_id, payment.payment_id, payment.yookassa_payment_id,
-                    payment.amount, payment.currency, payment.status.value,
-                    payment.description, payment.confirmation_url,
-                    str(payment.metadata) if payment.metadata else None,
-                    payment.payment_id, payment.updated_at.isoformat(),
-                    payment.completed_at.isoformat() if payment.completed_at else None
-                ))
-                
-                await db.commit()
-                logger.info(f"Платеж {payment.payment_id} сохранен")
-                return True
-                
+            db = await self._get_connection()
+            payment.updated_at = datetime.now()
+            
+            async with self._write_lock:
+                await db.execute(UPSERT_PAYMENT_SQL, self._payment_params(payment))
+            self._invalidate_payments([payment.payment_id])
+            
+            logger.debug("Платеж %s сохранен", payment.payment_id)
+            return True
+            
         except Exception as e:
-            logger.error(f"Ошибка сохранения платежа {payment.payment_id}: {e}")
+            logger.error("Ошибка сохранения платежа %s: %s", payment.payment_id, e)
             return False
     
     async def get_payment(self, payment_id: str) -> Optional[Payment]:
         """Получить платеж по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        row = self._payment_rows.get(payment_id)
+        if row is None:
+            generation = self._cache_generation
+            async with self._acquire_reader() as db:
+                async with db.execute(
+                    f"SELECT {PAYMENT_COLUMNS} FROM payments WHERE payment_id = ?", (payment_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+            
+            if row and generation == self._cache_generation:
+                self._payment_rows.set(payment_id, row)
+        
+        return self._row_to_payment(row) if row else None
+    
+    async def get_payment_for_user(self, payment_id: str, user_id: int) -> Optional[Payment]:
+        """Получить платеж по ID, только если он принадлежит пользователю"""
+        async with self._acquire_reader() as db:
             async with db.execute(
-                "SELECT * FROM payments WHERE payment_id = ?", (payment_id,)
+                f"SELECT {PAYMENT_COLUMNS} FROM payments WHERE payment_id = ? AND user_id = ? LIMIT 1",
+                (payment_id, user_id)
             ) as cursor:
                 row = await cursor.fetchone()
-                
-                if row:
-                    return Payment(
-                        id=row['id'],
-                        user_id=row['user_id'],
-                        payment_id=row['payment_id'],
-                        yookassa_payment_id=row['yookassa_payment_id'],
-                        amount=row['amount'],
-                        currency=row['currency'],
-                        status=PaymentStatus(row['status']),
-                        description=row['description'],
-                        confirmation_url=row['confirmation_url'],
-                        metadata=eval(row['metadata']) if row['metadata'] else None,
-                        created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                        updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None,
-                        completed_at=datetime.fromisoformat(row['completed_at']) if row['completed_at'] else None
-                    )
+        
+        return self._row_to_payment(row) if row else None
+    
+    async def update_payment_status(
+        self, 
+        payment_id: str, 
+        user_id: int, 
+        status: PaymentStatus, 
+        completed_at: Optional[datetime] = None,
+        expected_status: Optional[PaymentStatus] = None
+    ) -> Optional[Payment]:
+        """
+        Атомарно обновить статус платежа пользователя
+        
+        Args:
+            expected_status: Обновлять только платеж в этом статусе
+                (по умолчанию - любой платеж, статус которого отличается от нового)
+        
+        Returns:
+            Обновленный платеж или None, если платеж не найден,
+            принадлежит другому пользователю или уже имеет этот статус
+            (не находится в expected_status)
+        """
+        status_condition = "status = ?" if expected_status else "status != ?"
+        
+        db = await self._get_connection()
+        async with self._write_lock:
+            async with db.execute(f"""
+                UPDATE payments 
+                SET status = ?, 
+                    completed_at = COALESCE(?, completed_at), 
+                    updated_at = ?
+                WHERE payment_id = ? 
+                AND user_id = ? 
+                AND {status_condition}
+                RETURNING {PAYMENT_COLUMNS}
+            """, (
+                status.value,
+                completed_at.isoformat() if completed_at else None,
+                datetime.now().isoformat(),
+                payment_id, user_id, (expected_status or status).value
+            )) as cursor:
+                row = await cursor.fetchone()
+        
+        self._invalidate_payments([payment_id])
+        if row:
+            logger.info("Статус платежа %s изменен на %s", payment_id, status.value)
+        return self._row_to_payment(row) if row else None
+    
+    def _invalidate_users(self, user_ids):
+        """Сбросить кэш строк пользователей (вызывается после записи)"""
+        self._cache_generation += 1
+        for user_id in user_ids:
+            self._user_rows.invalidate(user_id)
+    
+    def _invalidate_payments(self, payment_ids):
+        """Сбросить кэш строк платежей (вызывается после записи)"""
+        self._cache_generation += 1
+        for payment_id in payment_ids:
+            self._payment_rows.invalidate(payment_id)
+    
+    @staticmethod
+    def _user_params(user: User) -> tuple:
+        """Параметры UPSERT_USER_SQL для пользователя"""
+        return (
+            user.user_id, user.username, user.first_name, user.last_name,
+            user.subscription_end.isoformat() if user.subscription_end else None,
+            _to_epoch(user.subscription_end) if user.subscription_end else None,
+            user.subscription_status.value, user.yookassa_customer_id,
+            user.is_active, user.total_payments,
+            user.updated_at.isoformat()
+        )
+    
+    @staticmethod
+    def _payment_params(payment: Payment) -> tuple:
+        """Параметры UPSERT_PAYMENT_SQL для платежа"""
+        return (
+            payment.user_id, payment.payment_id, payment.yookassa_payment_id,
+            payment.amount, payment.currency, payment.status.value,
+            payment.description, payment.confirmation_url,
+            safe_json_dumps(payment.metadata) if payment.metadata else None,
+            payment.updated_at.isoformat(),
+            payment.completed_at.isoformat() if payment.completed_at else None
+        )
+    
+    @staticmethod
+    def _row_to_user(row: tuple) -> User:
+        """Преобразование строки таблицы users (колонки USER_COLUMNS) в User"""
+        (user_id, username, first_name, last_name, subscription_end, subscription_status,
+         yookassa_customer_id, is_active, total_payments, created_at, updated_at) = row
+        # Позиционные аргументы в порядке полей User
+        return User(
+            user_id,
+            username,
+            first_name,
+            last_name,
+            _FROMISO(subscription_end) if subscription_end else None,
+            _SUBSCRIPTION_STATUS_MAP[subscription_status],
+            yookassa_customer_id,
+            bool(is_active),
+            total_payments,
+            _FROMISO(created_at) if created_at else None,
+            _FROMISO(updated_at) if updated_at else None
+        )
+    
+    @staticmethod
+    def _load_metadata(value: Optional[str]) -> Optional[dict]:
+        """Разбор metadata платежа (JSON; старые записи хранятся как repr словаря)"""
+        if not value:
+            return None
+        
+        if value.startswith("{'"):
+            try:
+                return ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                logger.warning("Не удалось разобрать metadata платежа: %s", value)
                 return None
+        
+        return safe_json_loads(value)
+    
+    @staticmethod
+    def _row_to_payment(row: tuple) -> Payment:
+        """Преобразование строки таблицы payments (колонки PAYMENT_COLUMNS) в Payment"""
+        (id_, user_id, payment_id, yookassa_payment_id, amount, currency, status, description,
+         confirmation_url, metadata, created_at, updated_at, completed_at) = row
+        # Позиционные аргументы в порядке полей Payment
+        return Payment(
+            id_,
+            user_id,
+            payment_id,
+            yookassa_payment_id,
+            amount,
+            currency,
+            _PAYMENT_STATUS_MAP[status],
+            description,
+            confirmation_url,
+            Database._load_metadata(metadata),
+            _FROMISO(created_at) if created_at else None,
+            _FROMISO(updated_at) if updated_at else None,
+            _FROMISO(completed_at) if completed_at else None
+        )
+
+
+def _to_epoch(value: datetime) -> int:
+    """
+    Дата в секундах эпохи для колонки subscription_end_ts
+    
+    Наивная дата считается как UTC - так же, как strftime('%s', ...)
+    в SQLite при переносе старых записей, поэтому сравнения согласованы.
+    """
+    return calendar.timegm(value.timetuple())
 
 
 # Глобальный экземпляр базы данных
@@ -1,8 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from enum import Enum
 
+from utils.helpers import format_dt
+
 
 class PaymentStatus(Enum):
     """Статусы платежа"""
@@ -20,7 +22,7 @@ class SubscriptionStatus(Enum):
     TRIAL = "trial"
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """Модель пользователя"""
     user_id: int
@@ -34,6 +36,10 @@ class User:
     total_payments: int = 0
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # Кэш отформатированной даты окончания: (subscription_end, строка)
+    _subscription_end_fmt: Optional[Tuple[datetime, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
     
     @property
     def full_name(self) -> str:
@@ -48,22 +54,43 @@ class User:
     @property
     def is_subscription_active(self) -> bool:
         """Активна ли подписка"""
+        return self.is_subscription_active_at(datetime.now())
+    
+    @property
+    def days_left(self) -> int:
+        """Количество дней до истечения подписки"""
+        return self.days_left_at(datetime.now())
+    
+    def is_subscription_active_at(self, now: datetime) -> bool:
+        """Активна ли подписка на момент now (для проверки с одним общим временем)"""
         return (
             self.subscription_end is not None
-            and self.subscription_end > datetime.now()
+            and self.subscription_end > now
             and self.subscription_status == SubscriptionStatus.ACTIVE
         )
     
-    @property
-    def days_left(self) -> int:
-        """Количество дней до истечения подписки"""
+    def days_left_at(self, now: datetime) -> int:
+        """Количество дней до истечения подписки на момент now"""
         if not self.subscription_end:
             return 0
-        delta = self.subscription_end - datetime.now()
+        delta = self.subscription_end - now
         return max(0, delta.days)
+    
+    @property
+    def subscription_end_fmt(self) -> str:
+        """Дата окончания подписки в формате ДД.ММ.ГГГГ ЧЧ:ММ"""
+        if not self.subscription_end:
+            return ""
+        # Пересчитываем строку только если дата изменилась
+        cached = self._subscription_end_fmt
+        if cached is None or cached[0] != self.subscription_end:
+            end = self.subscription_end
+            cached = (end, format_dt(end))
+            self._subscription_end_fmt = cached
+        return cached[1]
 
 
-@dataclass
+@dataclass(slots=True)
 class Payment:
     """Модель платежа"""
     id: Optional[int] = None
@@ -91,7 +118,7 @@ class Payment:
         return self.status == PaymentStatus.PENDING
 
 
-@dataclass
+@dataclass(slots=True)
 class InviteLink:
     """Модель инвайт-ссылки"""
     id: Optional[int] = None
@@ -111,7 +138,7 @@ class InviteLink:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SubscriptionHistory:
     """История подписок пользователя"""
     id: Optional[int] = None
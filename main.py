@@ -12,25 +12,36 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.fsm.storage.memory import MemoryStorage
 
 # Импортируем конфигурацию с обработкой ошибок
 try:
-    from config.settings import TELEGRAM_BOT_TOKEN, LOG_LEVEL, LOG_DIR, YOOKASSA_SHOP_ID
+    from config.settings import (
+        TELEGRAM_BOT_TOKEN, LOG_LEVEL, LOG_DIR, YOOKASSA_SHOP_ID, CHANNEL_ID, ensure_dirs
+    )
 except Exception as e:
     print(f"❌ Ошибка загрузки конфигурации: {e}")
     print("💡 Проверьте файл .env и убедитесь, что все переменные настроены")
     sys.exit(1)
 
 from utils.logger import setup_logging
-from database.database import init_database
+from utils.helpers import json_dumps, json_loads
+from database.database import db, init_database
 from bot.handlers import register_all_handlers
+from bot.middleware.rate_limit import RateLimitMiddleware
 from services.telegram_service import init_telegram_service
+from services.yookassa_service import yookassa_service
+from tasks.scheduler import start_scheduler
+from webhook.server import start_webhook_server
 
 
 async def main():
     """Основная функция запуска бота"""
     
+    # Создание директорий логов и базы данных
+    ensure_dirs()
+    
     # Настройка логирования
     setup_logging(level=LOG_LEVEL, log_dir=LOG_DIR)
     logger = logging.getLogger(__name__)
@@ -50,9 +61,16 @@ async def main():
         
         # Создание бота и диспетчера
         logger.info("🤖 Создание бота...")
-        bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        # Одна HTTP-сессия с пулом соединений на весь процесс:
+        # keep-alive соединения переиспользуются всеми запросами к Telegram API.
+        # Клавиатуры в запросах и ответы API (де)сериализуются через orjson
+        session = AiohttpSession(limit=100, json_dumps=json_dumps, json_loads=json_loads)
+        bot = Bot(token=TELEGRAM_BOT_TOKEN, session=session)
         dp = Dispatcher(storage=MemoryStorage())
         
+        # Все исходящие запросы к Telegram API проходят через ограничитель частоты
+        bot.session.middleware(RateLimitMiddleware())
+        
         # Инициализация telegram_service
         init_telegram_service(bot)
         logger.info("✅ Telegram сервис инициализирован")
@@ -68,7 +86,6 @@ async def main():
         # Запуск планировщика задач (только если не в тестовом режиме)
         if not test_mode:
             try:
-                from tasks.scheduler import start_scheduler
                 scheduler = start_scheduler()
                 logger.info("✅ Планировщик задач запущен")
             except Exception as e:
@@ -79,7 +96,6 @@ async def main():
         # Webhook сервер запускаем только в продакшене
         if not test_mode:
             try:
-                from webhook.server import start_webhook_server
                 webhook_task = asyncio.create_task(start_webhook_server())
                 logger.info("✅ Webhook сервер запущен")
             except Exception as e:
@@ -87,29 +103,30 @@ async def main():
         else:
             logger.info("⚠️ Webhook сервер отключен в тестовом режиме")
         
-        # Информация о боте
+        # Информация о боте и канале (независимые запросы - параллельно)
+        bot_info, chat = await asyncio.gather(
+            bot.get_me(), bot.get_chat(CHANNEL_ID), return_exceptions=True
+        )
+        
+        if isinstance(bot_info, Exception):
+            logger.error(f"❌ Ошибка получения информации о боте: {bot_info}")
+            return
+        logger.info(f"✅ Бот запущен: @{bot_info.username} ({bot_info.first_name})")
+        
+        # Проверяем права в канале
         try:
-            bot_info = await bot.get_me()
-            logger.info(f"✅ Бот запущен: @{bot_info.username} ({bot_info.first_name})")
+            if isinstance(chat, Exception):
+                raise chat
+            logger.info(f"✅ Канал найден: {chat.title}")
             
-            # Проверяем права в канале
-            from config.settings import CHANNEL_ID
-            try:
-                chat = await bot.get_chat(CHANNEL_ID)
-                logger.info(f"✅ Канал найден: {chat.title}")
-                
-                bot_member = await bot.get_chat_member(CHANNEL_ID, bot_info.id)
-                if bot_member.status in ['administrator', 'creator']:
-                    logger.info("✅ Бот имеет права администратора в канале")
-                else:
-                    logger.warning("⚠️ Бот не является администратором канала")
-            except Exception as e:
-                logger.error(f"❌ Ошибка проверки канала: {e}")
-                logger.warning("⚠️ Убедитесь, что бот добавлен в канал как администратор")
-                
+            bot_member = await bot.get_chat_member(CHANNEL_ID, bot_info.id)
+            if bot_member.status in ['administrator', 'creator']:
+                logger.info("✅ Бот имеет права администратора в канале")
+            else:
+                logger.warning("⚠️ Бот не является администратором канала")
         except Exception as e:
-            logger.error(f"❌ Ошибка получения информации о боте: {e}")
-            return
+            logger.error(f"❌ Ошибка проверки канала: {e}")
+            logger.warning("⚠️ Убедитесь, что бот добавлен в канал как администратор")
         
         # Уведомляем о режиме работы
         if test_mode:
@@ -144,13 +161,23 @@ async def main():
                 logger.info("✅ Планировщик остановлен")
             except:
                 pass
+        
+        if 'bot' in locals():
+            await bot.session.close()
+            logger.info("✅ Сессия бота закрыта")
+        
+        await yookassa_service.close()
+        logger.info("✅ Сессия YooKassa закрыта")
+        
+        await db.close()
+        logger.info("✅ Соединение с базой данных закрыто")
 
 
 if __name__ == "__main__":
     try:
         # Проверяем версию Python
-        if sys.version_info < (3, 9):
-            print("❌ Требуется Python 3.9 или выше")
+        if sys.version_info < (3, 10):
+            print("❌ Требуется Python 3.10 или выше")
             sys.exit(1)
             
         asyncio.run(main())
@@ -29,7 +29,12 @@ echo -e "${YELLOW}📁 Директория бэкапа: ${BACKUP_PATH}${NC}"
 # 1. Бэкап базы данных
 echo -e "${YELLOW}🗄️ Создание бэкапа базы данных...${NC}"
 if [ -f "${BOT_DIR}/data/users.db" ]; then
-    cp "${BOT_DIR}/data/users.db" "${BACKUP_PATH}/users.db"
+    # Копируем через .backup: в режиме WAL свежие данные лежат в users.db-wal
+    if ! command -v sqlite3 &> /dev/null; then
+        echo -e "${RED}❌ sqlite3 не найден, установите пакет sqlite3${NC}"
+        exit 1
+    fi
+    sqlite3 "${BOT_DIR}/data/users.db" ".backup '${BACKUP_PATH}/users.db'"
     echo -e "${GREEN}✅ База данных скопирована${NC}"
 else
     echo -e "${RED}❌ База данных не найдена${NC}"
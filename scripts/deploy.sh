@@ -8,7 +8,7 @@ set -e
 # Конфигурация
 BOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 SERVICE_NAME="payment-bot"
-PYTHON_VERSION="3.9"
+PYTHON_VERSION="3.10"
 
 # Цвета для вывода
 RED='\033[0;31m'
@@ -48,7 +48,7 @@ if check_command python3; then
     echo -e "${GREEN}✅ Python найден: ${python_version}${NC}"
     
     # Проверка версии
-    if python3 -c "import sys; exit(0 if sys.version_info >= (3, 9) else 1)"; then
+    if python3 -c "import sys; exit(0 if sys.version_info >= (3, 10) else 1)"; then
         echo -e "${GREEN}✅ Версия Python подходит${NC}"
     else
         echo -e "${RED}❌ Требуется Python ${PYTHON_VERSION} или выше${NC}"
@@ -7,9 +7,10 @@ echo "🚀 Настройка Telegram Payment Bot..."
 
 # Проверка Python версии
 python_version=$(python3 --version 2>&1 | cut -d' ' -f2 | cut -d'.' -f1,2)
-required_version="3.9"
+required_version="3.10"
 
-if [[ $(echo "$python_version >= $required_version" | bc -l) -eq 0 ]]; then
+# Сравниваем через Python: bc считает 3.9 больше 3.10
+if ! python3 -c "import sys; exit(0 if sys.version_info >= (3, 10) else 1)"; then
     echo "❌ Требуется Python $required_version или выше. Установлена версия: $python_version"
     exit 1
 fi
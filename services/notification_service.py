@@ -1,13 +1,117 @@
+import functools
 import logging
+import time
 from typing import Optional
-from datetime import datetime
 
-from config.settings import CHANNEL_ID, SUBSCRIPTION_PRICE, MESSAGES
+from config.settings import CHANNEL_ID, HELP_TEXTS, MESSAGES, SUPPORT_TEXT, WELCOME_MESSAGE
 from database.models import User
 from bot.keyboards.inline import get_subscription_keyboard, get_help_keyboard
+from utils.helpers import format_dt
 
 logger = logging.getLogger(__name__)
 
+# Шаблоны уведомлений (обрезаются и получают CHANNEL_ID один раз при импорте)
+ACTIVATED_WITHOUT_LINK_TEMPLATE = f"""
+✅ <b>Оплата прошла успешно!</b>
+
+📅 Подписка активна до: {{subscription_end}}
+📢 Канал: {CHANNEL_ID}
+
+Обратитесь к администратору для получения доступа к каналу.
+
+Спасибо за оплату! 🎉
+""".strip()
+
+EXTENDED_TEMPLATE = """
+✅ <b>Подписка продлена!</b>
+
+📅 Активна до: {subscription_end}
+⏰ Продлена на: {days} дней
+💡 Причина: {reason_text}
+
+Спасибо за то, что с нами! 🎉
+""".strip()
+
+CANCELLED_TEMPLATE = f"""
+❌ <b>Подписка отменена</b>
+
+💡 Причина: {{reason_text}}
+📢 Доступ к каналу {CHANNEL_ID} приостановлен
+
+Для возобновления подписки используйте команду /pay
+""".strip()
+
+REMINDER_TEMPLATE = """
+{emoji} <b>Напоминание о подписке</b>
+
+📅 Ваша подписка истекает {urgency}: {subscription_end}
+⏰ Осталось дней: {days_left}
+
+Продлите подписку, чтобы не потерять доступ к каналу!
+""".strip()
+
+ADMIN_NOTIFICATION_TEMPLATE = """
+🔔 <b>Уведомление администратора</b>
+
+⏰ {timestamp}
+
+{message}
+""".strip()
+
+# Отформатированное время для уведомлений админу: (строка, секунда epoch)
+_ADMIN_TS_CACHE = ("", 0)
+
+# Человекочитаемые причины продления и отмены подписки
+EXTEND_REASONS = {
+    "payment": "оплаты",
+    "manual": "администратором",
+    "bonus": "бонуса",
+    "refund": "компенсации"
+}
+
+CANCEL_REASONS = {
+    "user_request": "по вашему запросу",
+    "payment_failed": "из-за неуспешной оплаты",
+    "violation": "за нарушение правил",
+    "refund": "в связи с возвратом средств"
+}
+
+
+def _admin_timestamp() -> str:
+    """Текущее время для уведомлений админу (форматируется не чаще раза в секунду)"""
+    global _ADMIN_TS_CACHE
+    
+    now = int(time.time())
+    if now != _ADMIN_TS_CACHE[1]:
+        _ADMIN_TS_CACHE = (time.strftime('%d.%m.%Y %H:%M:%S', time.localtime(now)), now)
+    
+    return _ADMIN_TS_CACHE[0]
+
+
+def _safe_send(action: str):
+    """
+    Декоратор для методов отправки: ошибка логируется, метод возвращает False
+    
+    Args:
+        action: Что отправлялось (для сообщения в логе)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await func(self, *args, **kwargs)
+            except Exception as e:
+                recipient = args[0] if args else next(iter(kwargs.values()), None)
+                logger.error(
+                    "Ошибка отправки %s %s: %s",
+                    action, getattr(recipient, 'user_id', recipient), e
+                )
+                return False
+        
+        return wrapper
+    
+    return decorator
+
 
 class NotificationService:
     """Сервис для отправки уведомлений пользователям"""
@@ -15,8 +119,9 @@ class NotificationService:
     def _get_telegram_service(self):
         """Получить telegram_service (ленивая загрузка)"""
         from services.telegram_service import telegram_service
-        return telegram_service
+        return telegram_service if telegram_service.bot else None
     
+    @_safe_send("приветствия пользователю")
     async def send_welcome_message(self, user: User) -> bool:
         """
         Отправить приветственное сообщение
@@ -27,29 +132,20 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            message = MESSAGES['welcome'].format(
-                channel_id=CHANNEL_ID,
-                price=int(SUBSCRIPTION_PRICE)
-            )
-            
-            keyboard = get_subscription_keyboard()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки приветствия пользователю {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        keyboard = get_subscription_keyboard()
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            WELCOME_MESSAGE,
+            keyboard
+        )
     
+    @_safe_send("уведомления об активации")
     async def send_subscription_activated(self, user: User, invite_link: Optional[str] = None) -> bool:
         """
         Отправить уведомление об активации подписки
@@ -61,38 +157,27 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            if invite_link:
-                message = MESSAGES['payment_success'].format(
-                    subscription_end=user.subscription_end.strftime('%d.%m.%Y %H:%M'),
-                    invite_link=invite_link
-                )
-            else:
-                message = f"""
-✅ <b>Оплата прошла успешно!</b>
-
-📅 Подписка активна до: {user.subscription_end.strftime('%d.%m.%Y %H:%M')}
-📢 Канал: {CHANNEL_ID}
-
-Обратитесь к администратору для получения доступа к каналу.
-
-Спасибо за оплату! 🎉
-                """.strip()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления об активации {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        if invite_link:
+            message = MESSAGES['payment_success'].format(
+                subscription_end=user.subscription_end_fmt,
+                invite_link=invite_link
+            )
+        else:
+            message = ACTIVATED_WITHOUT_LINK_TEMPLATE.format(
+                subscription_end=user.subscription_end_fmt
+            )
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            message
+        )
     
+    @_safe_send("уведомления об истечении")
     async def send_subscription_expired(self, user: User) -> bool:
         """
         Отправить уведомление об истечении подписки
@@ -103,25 +188,21 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            message = MESSAGES['subscription_expired']
-            keyboard = get_subscription_keyboard()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления об истечении {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = MESSAGES['subscription_expired']
+        keyboard = get_subscription_keyboard()
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("уведомления о продлении")
     async def send_subscription_extended(self, user: User, days: int, reason: str) -> bool:
         """
         Отправить уведомление о продлении подписки
@@ -134,38 +215,23 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            reason_text = {
-                "payment": "оплаты",
-                "manual": "администратором",
-                "bonus": "бонуса",
-                "refund": "компенсации"
-            }.get(reason, reason)
-            
-            message = f"""
-✅ <b>Подписка продлена!</b>
-
-📅 Активна до: {user.subscription_end.strftime('%d.%m.%Y %H:%M')}
-⏰ Продлена на: {days} дней
-💡 Причина: {reason_text}
-
-Спасибо за то, что с нами! 🎉
-            """.strip()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления о продлении {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = EXTENDED_TEMPLATE.format(
+            subscription_end=user.subscription_end_fmt,
+            days=days,
+            reason_text=EXTEND_REASONS.get(reason, reason)
+        )
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            message
+        )
     
+    @_safe_send("уведомления об отмене")
     async def send_subscription_cancelled(self, user: User, reason: str) -> bool:
         """
         Отправить уведомление об отмене подписки
@@ -177,40 +243,24 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            reason_text = {
-                "user_request": "по вашему запросу",
-                "payment_failed": "из-за неуспешной оплаты",
-                "violation": "за нарушение правил",
-                "refund": "в связи с возвратом средств"
-            }.get(reason, reason)
-            
-            message = f"""
-❌ <b>Подписка отменена</b>
-
-💡 Причина: {reason_text}
-📢 Доступ к каналу {CHANNEL_ID} приостановлен
-
-Для возобновления подписки используйте команду /pay
-            """.strip()
-            
-            keyboard = get_subscription_keyboard()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления об отмене {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = CANCELLED_TEMPLATE.format(
+            reason_text=CANCEL_REASONS.get(reason, reason)
+        )
+        
+        keyboard = get_subscription_keyboard()
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("уведомления о неуспешной оплате")
     async def send_payment_failed(self, user_id: int, reason: str = "") -> bool:
         """
         Отправить уведомление о неуспешной оплате
@@ -222,28 +272,24 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            message = MESSAGES['payment_failed']
-            if reason:
-                message += f"\n\nПричина: {reason}"
-            
-            keyboard = get_subscription_keyboard()
-            
-            return await telegram_service.send_message(
-                user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления о неуспешной оплате {user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = MESSAGES['payment_failed']
+        if reason:
+            message += f"\n\nПричина: {reason}"
+        
+        keyboard = get_subscription_keyboard()
+        
+        return await telegram_service.send_message(
+            user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("напоминания")
     async def send_subscription_reminder(self, user: User, days_left: int) -> bool:
         """
         Отправить напоминание о скором истечении подписки
@@ -255,43 +301,37 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            if days_left <= 1:
-                emoji = "🚨"
-                urgency = "срочно"
-            elif days_left <= 3:
-                emoji = "⚠️"
-                urgency = "скоро"
-            else:
-                emoji = "ℹ️"
-                urgency = ""
-            
-            message = f"""
-{emoji} <b>Напоминание о подписке</b>
-
-📅 Ваша подписка истекает {urgency}: {user.subscription_end.strftime('%d.%m.%Y в %H:%M')}
-⏰ Осталось дней: {days_left}
-
-Продлите подписку, чтобы не потерять доступ к каналу!
-            """.strip()
-            
-            keyboard = get_subscription_keyboard()
-            
-            return await telegram_service.send_message(
-                user.user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки напоминания {user.user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        if days_left <= 1:
+            emoji = "🚨"
+            urgency = "срочно"
+        elif days_left <= 3:
+            emoji = "⚠️"
+            urgency = "скоро"
+        else:
+            emoji = "ℹ️"
+            urgency = ""
+        
+        message = REMINDER_TEMPLATE.format(
+            emoji=emoji,
+            urgency=urgency,
+            subscription_end=format_dt(user.subscription_end, sep=" в ") if user.subscription_end else "",
+            days_left=days_left
+        )
+        
+        keyboard = get_subscription_keyboard()
+        
+        return await telegram_service.send_message(
+            user.user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("уведомления админу")
     async def send_admin_notification(self, admin_id: int, message: str) -> bool:
         """
         Отправить уведомление администратору
@@ -303,29 +343,22 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            formatted_message = f"""
-🔔 <b>Уведомление администратора</b>
-
-⏰ {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}
-
-{message}
-            """.strip()
-            
-            return await telegram_service.send_message(
-                admin_id,
-                formatted_message
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки уведомления админу {admin_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        formatted_message = ADMIN_NOTIFICATION_TEMPLATE.format(
+            timestamp=_admin_timestamp(),
+            message=message
+        )
+        
+        return await telegram_service.send_message(
+            admin_id,
+            formatted_message
+        )
     
+    @_safe_send("контактов поддержки")
     async def send_support_message(self, user_id: int) -> bool:
         """
         Отправить сообщение с контактами поддержки
@@ -336,36 +369,22 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            message = """
-📞 <b>Поддержка</b>
-
-Если у вас возникли проблемы, обратитесь к нашей службе поддержки:
-
-📧 Email: support@example.com
-💬 Telegram: @support_bot
-🕐 Время работы: 9:00-18:00 (МСК)
-
-Мы поможем решить любые вопросы!
-            """.strip()
-            
-            keyboard = get_help_keyboard()
-            
-            return await telegram_service.send_message(
-                user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки контактов поддержки {user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = SUPPORT_TEXT
+        
+        keyboard = get_help_keyboard()
+        
+        return await telegram_service.send_message(
+            user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("справки")
     async def send_help_message(self, user_id: int, help_type: str = "general") -> bool:
         """
         Отправить справочное сообщение
@@ -377,87 +396,21 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            messages = {
-                "payment": """
-💳 <b>Как оплатить подписку?</b>
-
-1. Используйте команду /pay
-2. Нажмите кнопку "💳 Оплатить"
-3. Выберите способ оплаты
-4. Следуйте инструкциям
-5. После оплаты нажмите "✅ Проверить оплату"
-
-Доступ откроется автоматически!
-                """.strip(),
-                
-                "access": """
-🔧 <b>Проблемы с доступом?</b>
-
-Возможные причины:
-• Подписка истекла
-• Ссылка-приглашение устарела
-• Вы покинули канал
-
-Решения:
-• Проверьте статус: /status
-• Продлите подписку: /pay
-• Обратитесь в поддержку
-
-Мы поможем!
-                """.strip(),
-                
-                "refund": """
-💰 <b>Возврат средств</b>
-
-Условия возврата:
-• В течение 14 дней с момента оплаты
-• При технических проблемах
-• По решению администрации
-
-Для возврата обратитесь в поддержку с указанием:
-• ID платежа
-• Причины возврата
-• Контактных данных
-                """.strip(),
-                
-                "general": """
-❓ <b>Справка по боту</b>
-
-<b>Основные команды:</b>
-/start - Начало работы
-/pay - Оплата подписки
-/status - Статус подписки
-/help - Эта справка
-
-<b>Как это работает:</b>
-1. Оплачиваете подписку
-2. Получаете ссылку на канал
-3. Присоединяетесь к каналу
-4. Наслаждаетесь контентом!
-
-<b>Поддержка:</b> @support_bot
-                """.strip()
-            }
-            
-            message = messages.get(help_type, messages["general"])
-            keyboard = get_help_keyboard()
-            
-            return await telegram_service.send_message(
-                user_id,
-                message,
-                keyboard
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки справки {user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        message = HELP_TEXTS.get(help_type, HELP_TEXTS["general"])
+        keyboard = get_help_keyboard()
+        
+        return await telegram_service.send_message(
+            user_id,
+            message,
+            keyboard
+        )
     
+    @_safe_send("сообщения")
     async def send_message(self, user_id: int, text: str, reply_markup=None) -> bool:
         """
         Отправить произвольное сообщение пользователю
@@ -470,21 +423,16 @@ class NotificationService:
         Returns:
             True если отправлено, False если ошибка
         """
-        try:
-            telegram_service = self._get_telegram_service()
-            if not telegram_service:
-                logger.error("telegram_service не инициализирован")
-                return False
-            
-            return await telegram_service.send_message(
-                user_id,
-                text,
-                reply_markup
-            )
-            
-        except Exception as e:
-            logger.error(f"Ошибка отправки сообщения {user_id}: {e}")
+        telegram_service = self._get_telegram_service()
+        if not telegram_service:
+            logger.error("telegram_service не инициализирован")
             return False
+        
+        return await telegram_service.send_message(
+            user_id,
+            text,
+            reply_markup
+        )
 
 
 # Глобальный экземпляр сервиса
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, List
@@ -12,6 +13,15 @@ from utils.logger import payment_logger
 
 logger = logging.getLogger(__name__)
 
+# Сколько истекших подписок обрабатывать одновременно (исключение из канала
+# и уведомление); темп запросов к Telegram держит RateLimitMiddleware:
+# исключения из канала идут только под общим лимитом, уведомления - еще и под лимитом чата
+EXPIRE_CONCURRENCY = 20
+
+# Длительность подписки и пробного периода (настройки не меняются во время работы)
+SUBSCRIPTION_DURATION = timedelta(days=SUBSCRIPTION_DURATION_DAYS)
+TRIAL_PERIOD = timedelta(days=TRIAL_PERIOD_DAYS)
+
 
 class SubscriptionService:
     """Сервис для управления подписками"""
@@ -46,7 +56,7 @@ class SubscriptionService:
             
             # Если есть пробный период, активируем его
             if TRIAL_PERIOD_DAYS > 0:
-                user.subscription_end = datetime.now() + timedelta(days=TRIAL_PERIOD_DAYS)
+                user.subscription_end = datetime.now() + TRIAL_PERIOD
                 user.subscription_status = SubscriptionStatus.TRIAL
                 logger.info(f"Пользователь {user.user_id} получил пробный период на {TRIAL_PERIOD_DAYS} дней")
         
@@ -75,33 +85,30 @@ class SubscriptionService:
             
             if user.subscription_end and user.subscription_end > now:
                 # Продлеваем существующую подписку
-                user.subscription_end += timedelta(days=SUBSCRIPTION_DURATION_DAYS)
+                user.subscription_end += SUBSCRIPTION_DURATION
             else:
                 # Создаем новую подписку
-                user.subscription_end = now + timedelta(days=SUBSCRIPTION_DURATION_DAYS)
+                user.subscription_end = now + SUBSCRIPTION_DURATION
             
             user.subscription_status = SubscriptionStatus.ACTIVE
             user.is_active = True
             user.total_payments += 1
             
-            # Сохраняем пользователя
-            if await db.save_user(user):
-                # Создаем инвайт-ссылку
-                invite_link = await telegram_service.create_invite_link(user_id)
-                
-                if invite_link:
-                    # Отправляем уведомление с ссылкой
-                    await notification_service.send_subscription_activated(
-                        user, invite_link
-                    )
-                else:
-                    # Отправляем уведомление без ссылки
-                    await notification_service.send_subscription_activated(
-                        user, None
-                    )
+            # Сохраняем пользователя и создаем инвайт-ссылку параллельно:
+            # ссылка одноразовая и сама истекает, если сохранение не удалось
+            saved, invite_link = await asyncio.gather(
+                db.save_user(user),
+                telegram_service.create_invite_link(user_id)
+            )
+            
+            if saved:
+                # Отправляем уведомление (без ссылки, если создать ее не удалось)
+                await notification_service.send_subscription_activated(
+                    user, invite_link
+                )
                 
-                payment_logger.subscription_extended(user_id, user.subscription_end)
                 logger.info(f"Подписка активирована для пользователя {user_id} до {user.subscription_end}")
+                payment_logger.subscription_extended(user_id, user.subscription_end)
                 return True
             else:
                 logger.error(f"Ошибка сохранения пользователя {user_id}")
@@ -130,11 +137,12 @@ class SubscriptionService:
                 return False
             
             now = datetime.now()
+            duration = timedelta(days=days)
             
             if user.subscription_end and user.subscription_end > now:
-                user.subscription_end += timedelta(days=days)
+                user.subscription_end += duration
             else:
-                user.subscription_end = now + timedelta(days=days)
+                user.subscription_end = now + duration
             
             user.subscription_status = SubscriptionStatus.ACTIVE
             user.is_active = True
@@ -171,11 +179,11 @@ class SubscriptionService:
             user.is_active = False
             
             if await db.save_user(user):
-                # Исключаем из канала
-                await telegram_service.kick_user_from_channel(user_id)
-                
-                # Отправляем уведомление
-                await notification_service.send_subscription_cancelled(user, reason)
+                # Исключение из канала и уведомление независимы - выполняем параллельно
+                await asyncio.gather(
+                    telegram_service.kick_user_from_channel(user_id),
+                    notification_service.send_subscription_cancelled(user, reason)
+                )
                 
                 payment_logger.user_kicked(user_id, reason)
                 logger.info(f"Подписка отменена для {user_id}. Причина: {reason}")
@@ -195,12 +203,19 @@ class SubscriptionService:
             Количество деактивированных подписок
         """
         try:
-            expired_users = await db.get_expired_users()
-            expired_count = 0
+            # Статус всех истекших подписок меняется одним UPDATE
+            expired_users = await db.expire_due_users()
+            
+            semaphore = asyncio.Semaphore(EXPIRE_CONCURRENCY)
             
-            for user in expired_users:
-                if await self._expire_user_subscription(user):
-                    expired_count += 1
+            async def expire_one(user: User) -> bool:
+                async with semaphore:
+                    return await self._expire_user_subscription(user)
+            
+            results = await asyncio.gather(
+                *(expire_one(user) for user in expired_users), return_exceptions=True
+            )
+            expired_count = sum(1 for result in results if result is True)
             
             if expired_count > 0:
                 logger.info(f"Деактивировано {expired_count} подписок")
@@ -213,33 +228,27 @@ class SubscriptionService:
     
     async def _expire_user_subscription(self, user: User) -> bool:
         """
-        Деактивировать подписку конкретного пользователя
+        Исключить из канала и уведомить пользователя, подписка которого
+        уже деактивирована в базе (см. Database.expire_due_users)
         
         Args:
             user: Пользователь
             
         Returns:
-            True если деактивирована, False если ошибка
+            True если обработан, False если ошибка
         """
         try:
-            # Обновляем статус
-            user.subscription_status = SubscriptionStatus.EXPIRED
-            user.is_active = False
+            # Исключение из канала и уведомление независимы - выполняем параллельно
+            await asyncio.gather(
+                telegram_service.kick_user_from_channel(user.user_id),
+                notification_service.send_subscription_expired(user)
+            )
             
-            if await db.save_user(user):
-                # Исключаем из канала
-                await telegram_service.kick_user_from_channel(user.user_id)
-                
-                # Отправляем уведомление
-                await notification_service.send_subscription_expired(user)
-                
-                payment_logger.subscription_expired(user.user_id)
-                payment_logger.user_kicked(user.user_id, "subscription_expired")
-                
-                logger.info(f"Подписка истекла для пользователя {user.user_id}")
-                return True
-            else:
-                return False
+            payment_logger.subscription_expired(user.user_id)
+            payment_logger.user_kicked(user.user_id, "subscription_expired")
+            
+            logger.info(f"Подписка истекла для пользователя {user.user_id}")
+            return True
                 
         except Exception as e:
             logger.error(f"Ошибка деактивации подписки для {user.user_id}: {e}")
@@ -260,11 +269,12 @@ class SubscriptionService:
             if not user:
                 return None
             
+            now = datetime.now()
             return {
-                "is_active": user.is_subscription_active,
+                "is_active": user.is_subscription_active_at(now),
                 "status": user.subscription_status.value,
                 "end_date": user.subscription_end,
-                "days_left": user.days_left,
+                "days_left": user.days_left_at(now),
                 "total_payments": user.total_payments,
                 "created_at": user.created_at
             }
@@ -281,17 +291,10 @@ class SubscriptionService:
             Словарь с количеством пользователей по статусам
         """
         try:
-            # Простая реализация без сложных SQL запросов
-            stats = {
-                "active": 0,
-                "expired": 0,
-                "trial": 0,
-                "suspended": 0,
-                "total": 0
-            }
+            counts = await db.count_users_by_status()
             
-            # В реальном проекте лучше сделать отдельные SQL запросы для каждого статуса
-            # Здесь упрощенная версия
+            stats = {status.value: counts.get(status.value, 0) for status in SubscriptionStatus}
+            stats["total"] = sum(counts.values())
             
             return stats
             
@@ -310,11 +313,12 @@ class SubscriptionService:
             Словарь со статистикой доходов
         """
         try:
-            # Упрощенная реализация
+            total_revenue, successful, failed = await db.get_payment_stats(days)
+            
             stats = {
-                "total_revenue": 0.0,
-                "successful_payments": 0,
-                "failed_payments": 0,
+                "total_revenue": total_revenue,
+                "successful_payments": successful,
+                "failed_payments": failed,
                 "period_days": days
             }
             
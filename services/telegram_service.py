@@ -1,22 +1,45 @@
-import aiohttp
+import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import AsyncIterable, Awaitable, Callable, Optional
 from aiogram import Bot
 from aiogram.types import ChatMember, InlineKeyboardMarkup
 from aiogram.enums import ChatMemberStatus
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
 
-from config.settings import TELEGRAM_BOT_TOKEN, CHANNEL_ID, INVITE_LINK_EXPIRE_HOURS
+from config.settings import CHANNEL_ID, INVITE_LINK_EXPIRE_HOURS
+from utils.cache import TTLCache
+from utils.helpers import iter_chunks
 
 logger = logging.getLogger(__name__)
 
+# Название и количество участников канала меняются медленно - кэшируем их
+CHANNEL_INFO_TTL = 60
+
+# Членство в канале кэшируется ненадолго: вход по инвайт-ссылке или выход
+# пользователя бот узнает не сразу, а исключение ботом сбрасывает запись
+MEMBER_CACHE_TTL = 60
+MEMBER_CACHE_SIZE = 100_000
+
+# Размер пачки одновременных отправок при рассылке; общий темп запросов
+# к Telegram держит RateLimitMiddleware
+BROADCAST_CHUNK_SIZE = 25
+
 
 class TelegramService:
     """Сервис для работы с Telegram API"""
     
     def __init__(self, bot: Bot = None):
-        self.bot = bot or Bot(token=TELEGRAM_BOT_TOKEN)
+        # Бот (и его HTTP-сессия) общий для всего процесса, задается в init_telegram_service
+        self.bot = bot
         self.channel_id = CHANNEL_ID
+        self._channel_info_cache = TTLCache(ttl=CHANNEL_INFO_TTL)
+        self._member_cache = TTLCache(ttl=MEMBER_CACHE_TTL, maxsize=MEMBER_CACHE_SIZE)
     
     async def create_invite_link(
         self, 
@@ -45,6 +68,9 @@ class TelegramService:
                 name=f"User {user_id}"
             )
             
+            # Пользователь вот-вот войдет в канал - закэшированное "не в канале" устарело
+            self._member_cache.invalidate(user_id)
+            
             logger.info(f"Создана инвайт-ссылка для пользователя {user_id}")
             return invite_link.invite_link
             
@@ -63,16 +89,13 @@ class TelegramService:
             True если успешно, False если ошибка
         """
         try:
-            # Банируем пользователя
-            await self.bot.ban_chat_member(
-                chat_id=self.channel_id,
-                user_id=user_id
-            )
-            
-            # Сразу разбаниваем, чтобы мог зайти снова после оплаты
+            # unbanChatMember без only_if_banned удаляет участника из канала
+            # и не банит его - после оплаты он сможет зайти снова.
+            # Один запрос вместо пары ban + unban
             await self.bot.unban_chat_member(
                 chat_id=self.channel_id,
-                user_id=user_id
+                user_id=user_id,
+                only_if_banned=False
             )
             
             logger.info(f"Пользователь {user_id} исключен из канала")
@@ -81,17 +104,28 @@ class TelegramService:
         except Exception as e:
             logger.error(f"Ошибка исключения пользователя {user_id}: {e}")
             return False
+        
+        finally:
+            # Даже при ошибке (например, таймауте) членство могло измениться
+            self._member_cache.invalidate(user_id)
     
     async def check_user_in_channel(self, user_id: int) -> bool:
         """
         Проверить, находится ли пользователь в канале
         
+        Результат кэшируется на MEMBER_CACHE_TTL секунд.
+        
         Args:
             user_id: ID пользователя
             
         Returns:
             True если пользователь в канале, False если нет
         """
+        # Ошибка запроса (None) не кэшируется
+        return bool(await self._member_cache.get_or_set(user_id, lambda: self._fetch_membership(user_id)))
+    
+    async def _fetch_membership(self, user_id: int) -> Optional[bool]:
+        """Запрос членства пользователя в канале к Telegram API (None при ошибке)"""
         try:
             member = await self.bot.get_chat_member(
                 chat_id=self.channel_id,
@@ -103,7 +137,7 @@ class TelegramService:
             
         except Exception as e:
             logger.error(f"Ошибка проверки пользователя {user_id} в канале: {e}")
-            return False
+            return None
     
     async def send_message(
         self, 
@@ -132,9 +166,20 @@ class TelegramService:
                 parse_mode=parse_mode
             )
             return True
+        
+        # Ожидаемые ошибки: лимиты, сеть, бот заблокирован, чат недоступен -
+        # без трассировки, но запись о неотправленном сообщении остается
+        except (
+            TelegramRetryAfter,
+            TelegramNetworkError,
+            TelegramForbiddenError,
+            TelegramBadRequest,
+        ) as e:
+            logger.warning("Сообщение пользователю %s не отправлено: %s", user_id, e)
+            return False
             
-        except Exception as e:
-            logger.error(f"Ошибка отправки сообщения пользователю {user_id}: {e}")
+        except Exception:
+            logger.exception("Ошибка отправки сообщения пользователю %s", user_id)
             return False
     
     async def send_message_to_channel(
@@ -173,83 +218,128 @@ class TelegramService:
             Словарь с информацией о канале или None
         """
         try:
-            chat = await self.bot.get_chat(self.channel_id)
+            # Два независимых запроса - выполняем параллельно; при ошибке любого
+            # возвращаем None (частичная информация не кэшируется и не показывается)
+            chat, member_count = await asyncio.gather(
+                self.bot.get_chat(self.channel_id),
+                self.bot.get_chat_member_count(self.channel_id)
+            )
             
             return {
                 "id": chat.id,
                 "title": chat.title,
                 "username": chat.username,
                 "description": chat.description,
-                "member_count": await self.bot.get_chat_member_count(self.channel_id)
+                "member_count": member_count
             }
             
         except Exception as e:
             logger.error(f"Ошибка получения информации о канале: {e}")
             return None
     
-    async def get_channel_member_count(self) -> int:
+    async def get_cached_channel_info(self, force_refresh: bool = False) -> Optional[dict]:
         """
-        Получить количество участников канала
+        Получить информацию о канале с кэшированием на CHANNEL_INFO_TTL секунд
         
+        Args:
+            force_refresh: Сбросить кэш и запросить данные заново
+            
+        Returns:
+            Словарь с информацией о канале или None
+        """
+        if force_refresh:
+            self._channel_info_cache.invalidate(self.channel_id)
+        
+        return await self._channel_info_cache.get_or_set(self.channel_id, self.get_channel_info)
+    
+    async def get_channel_member_count(self, force_refresh: bool = False) -> int:
+        """
+        Получить количество участников канала (из кэша информации о канале)
+        
+        Args:
+            force_refresh: Сбросить кэш и запросить данные заново
+            
         Returns:
             Количество участников или 0 при ошибке
         """
-        try:
-            return await self.bot.get_chat_member_count(self.channel_id)
-        except Exception as e:
-            logger.error(f"Ошибка получения количества участников: {e}")
-            return 0
+        channel_info = await self.get_cached_channel_info(force_refresh)
+        return channel_info["member_count"] if channel_info else 0
     
     async def broadcast_message(
         self, 
-        user_ids: List[int], 
+        user_ids: AsyncIterable[int], 
         text: str, 
-        reply_markup: InlineKeyboardMarkup = None
+        reply_markup: InlineKeyboardMarkup = None,
+        on_progress: Optional[Callable[[dict], Awaitable[None]]] = None
     ) -> dict:
         """
-        Рассылка сообщения списку пользователей
+        Рассылка сообщения пользователям
+        
+        Получатели читаются потоком и обрабатываются пачками по
+        BROADCAST_CHUNK_SIZE: внутри пачки сообщения уходят параллельно,
+        в памяти не держится весь список.
         
         Args:
-            user_ids: Список ID пользователей
+            user_ids: Асинхронный итератор ID пользователей
             text: Текст сообщения
             reply_markup: Клавиатура
+            on_progress: Корутина, вызываемая после каждой пачки с текущей статистикой
             
         Returns:
             Словарь со статистикой рассылки
         """
-        sent = 0
-        failed = 0
-        blocked = 0
-        
-        for user_id in user_ids:
-            try:
-                await self.bot.send_message(
-                    chat_id=user_id,
-                    text=text,
-                    reply_markup=reply_markup,
-                    parse_mode="HTML"
-                )
-                sent += 1
-                
-            except Exception as e:
-                error_str = str(e).lower()
-                if "blocked" in error_str or "deactivated" in error_str:
-                    blocked += 1
-                else:
-                    failed += 1
-                
-                logger.warning(f"Не удалось отправить сообщение пользователю {user_id}: {e}")
+        result = {"total": 0, "sent": 0, "failed": 0, "blocked": 0}
         
-        result = {
-            "total": len(user_ids),
-            "sent": sent,
-            "failed": failed,
-            "blocked": blocked
-        }
+        async for chunk in iter_chunks(user_ids, BROADCAST_CHUNK_SIZE):
+            statuses = await asyncio.gather(*[
+                self.send_broadcast_message(user_id, text, reply_markup)
+                for user_id in chunk
+            ])
+            
+            for status in statuses:
+                result[status] += 1
+            result["total"] += len(chunk)
+            
+            if on_progress is not None:
+                await on_progress(result)
         
-        logger.info(f"Рассылка завершена: {result}")
+        logger.info("Рассылка завершена: %s", result)
         return result
     
+    async def send_broadcast_message(
+        self, 
+        user_id: int, 
+        text: str, 
+        reply_markup: InlineKeyboardMarkup = None
+    ) -> str:
+        """
+        Отправить сообщение рассылки одному пользователю
+        
+        Args:
+            user_id: ID пользователя
+            text: Текст сообщения
+            reply_markup: Клавиатура
+            
+        Returns:
+            Результат отправки: "sent", "blocked" или "failed"
+        """
+        try:
+            await self.bot.send_message(
+                chat_id=user_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode="HTML"
+            )
+            return "sent"
+            
+        except Exception as e:
+            logger.warning(f"Не удалось отправить сообщение пользователю {user_id}: {e}")
+            
+            error_str = str(e).lower()
+            if "blocked" in error_str or "deactivated" in error_str:
+                return "blocked"
+            return "failed"
+    
     async def revoke_invite_link(self, invite_link: str) -> bool:
         """
         Отозвать инвайт-ссылку
@@ -295,10 +385,10 @@ class TelegramService:
             return None
 
 
-# Глобальный экземпляр сервиса
-telegram_service = None
+# Глобальный экземпляр сервиса (модули импортируют его до запуска бота,
+# поэтому экземпляр не пересоздается, а только получает бота)
+telegram_service = TelegramService()
 
 def init_telegram_service(bot: Bot):
     """Инициализация сервиса с ботом"""
-    global telegram_service
-    telegram_service = TelegramService(bot)
\ No newline at end of file
+    telegram_service.bot = bot
\ No newline at end of file
@@ -1,10 +1,11 @@
+import asyncio
 import aiohttp
 import uuid
 import logging
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 
-from config.settings import YOOKASSA_SHOP_ID, YOOKASSA_SECRET_KEY, YOOKASSA_BASE_URL
+from config.settings import YOOKASSA_SHOP_ID, YOOKASSA_SECRET_KEY, YOOKASSA_BASE_URL, YOOKASSA_POOL_SIZE
 from database.models import Payment, PaymentStatus
 from utils.logger import payment_logger
 
@@ -23,9 +24,40 @@ class YooKassaService:
         if self.test_mode:
             logger.warning("ЮKassa работает в тестовом режиме")
         
-    def _get_auth(self) -> aiohttp.BasicAuth:
-        """Получить авторизацию для запросов"""
-        return aiohttp.BasicAuth(self.shop_id, self.secret_key)
+        # Запросы информации о платежах, которые сейчас выполняются: {yookassa_payment_id: task}
+        self._inflight_payment_info: Dict[str, asyncio.Task] = {}
+        
+        # Авторизация создается один раз (в тестовом режиме запросов к API нет)
+        self._auth = None if self.test_mode else aiohttp.BasicAuth(self.shop_id, self.secret_key)
+        
+        # Общая HTTP-сессия (создается при первом запросе)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Получить общую HTTP-сессию для запросов к YooKassa API
+        
+        Keep-alive соединения пула переиспользуются между запросами -
+        TCP и TLS рукопожатие не повторяется для каждого платежа.
+        """
+        if self._session is None or self._session.closed:
+            # Все запросы идут на один хост, поэтому ограничение пула - на хост;
+            # DNS кэшируется, чтобы всплески запросов не ждали резолвинга
+            connector = aiohttp.TCPConnector(
+                limit=YOOKASSA_POOL_SIZE,
+                limit_per_host=YOOKASSA_POOL_SIZE,
+                ttl_dns_cache=600,
+                keepalive_timeout=90,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(auth=self._auth, connector=connector)
+        return self._session
+    
+    async def close(self):
+        """Закрыть HTTP-сессию"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def create_payment(
         self, 
@@ -47,7 +79,7 @@ class YooKassaService:
             Объект Payment или None при ошибке
         """
         try:
-            payment_id = str(uuid.uuid4())
+            payment_id = uuid.uuid4().hex
             
             # В тестовом режиме возвращаем мок-платеж
             if self.test_mode:
@@ -93,38 +125,37 @@ class YooKassaService:
                 "Idempotence-Key": payment_id
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments",
-                    json=data,
-                    headers=headers,
-                    auth=self._get_auth()
-                ) as response:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/payments",
+                json=data,
+                headers=headers
+            ) as response:
+                
+                if response.status == 200:
+                    result = await response.json()
+                    
+                    payment = Payment(
+                        payment_id=payment_id,
+                        yookassa_payment_id=result["id"],
+                        user_id=user_id,
+                        amount=amount,
+                        description=description,
+                        status=PaymentStatus.PENDING,
+                        confirmation_url=result["confirmation"]["confirmation_url"],
+                        metadata=result.get("metadata", {}),
+                        created_at=datetime.now()
+                    )
+                    
+                    payment_logger.payment_created(user_id, payment_id, amount)
+                    logger.info(f"Создан платеж {payment_id} для пользователя {user_id}")
+                    
+                    return payment
+                else:
+                    error_text = await response.text()
+                    logger.error(f"Ошибка создания платежа: {response.status} - {error_text}")
+                    return None
                     
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        payment = Payment(
-                            payment_id=payment_id,
-                            yookassa_payment_id=result["id"],
-                            user_id=user_id,
-                            amount=amount,
-                            description=description,
-                            status=PaymentStatus.PENDING,
-                            confirmation_url=result["confirmation"]["confirmation_url"],
-                            metadata=result.get("metadata", {}),
-                            created_at=datetime.now()
-                        )
-                        
-                        payment_logger.payment_created(user_id, payment_id, amount)
-                        logger.info(f"Создан платеж {payment_id} для пользователя {user_id}")
-                        
-                        return payment
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка создания платежа: {response.status} - {error_text}")
-                        return None
-                        
         except Exception as e:
             logger.error(f"Исключение при создании платежа: {e}")
             return None
@@ -133,12 +164,28 @@ class YooKassaService:
         """
         Получить информацию о платеже
         
+        Одновременные запросы одного и того же платежа (повторные нажатия
+        "Проверить оплату", webhook) объединяются в один запрос к API.
+        
         Args:
             yookassa_payment_id: ID платежа в YooKassa
             
         Returns:
             Словарь с информацией о платеже или None
         """
+        task = self._inflight_payment_info.get(yookassa_payment_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch_payment_info(yookassa_payment_id))
+            self._inflight_payment_info[yookassa_payment_id] = task
+            task.add_done_callback(
+                lambda _: self._inflight_payment_info.pop(yookassa_payment_id, None)
+            )
+        
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(task)
+    
+    async def _fetch_payment_info(self, yookassa_payment_id: str) -> Optional[Dict[str, Any]]:
+        """Запрос информации о платеже к YooKassa API"""
         try:
             # В тестовом режиме возвращаем мок-данные
             if self.test_mode:
@@ -153,18 +200,17 @@ class YooKassaService:
                 return None
             
             # Реальный запрос к ЮKassa
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/payments/{yookassa_payment_id}",
-                    auth=self._get_auth()
-                ) as response:
+            session = await self._get_session()
+            async with session.get(
+                f"{self.base_url}/payments/{yookassa_payment_id}"
+            ) as response:
+                
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    logger.error(f"Ошибка получения платежа: {response.status}")
+                    return None
                     
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"Ошибка получения платежа: {response.status}")
-                        return None
-                        
         except Exception as e:
             logger.error(f"Исключение при получении платежа: {e}")
             return None
@@ -193,20 +239,19 @@ class YooKassaService:
                     "currency": "RUB"
                 }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments/{yookassa_payment_id}/capture",
-                    json=data,
-                    auth=self._get_auth()
-                ) as response:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/payments/{yookassa_payment_id}/capture",
+                json=data
+            ) as response:
+                
+                if response.status == 200:
+                    logger.info(f"Платеж {yookassa_payment_id} подтвержден")
+                    return True
+                else:
+                    logger.error(f"Ошибка подтверждения платежа: {response.status}")
+                    return False
                     
-                    if response.status == 200:
-                        logger.info(f"Платеж {yookassa_payment_id} подтвержден")
-                        return True
-                    else:
-                        logger.error(f"Ошибка подтверждения платежа: {response.status}")
-                        return False
-                        
         except Exception as e:
             logger.error(f"Исключение при подтверждении платежа: {e}")
             return False
@@ -227,19 +272,18 @@ class YooKassaService:
                 logger.info(f"Тестовая отмена платежа {yookassa_payment_id}")
                 return True
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/payments/{yookassa_payment_id}/cancel",
-                    auth=self._get_auth()
-                ) as response:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/payments/{yookassa_payment_id}/cancel"
+            ) as response:
+                
+                if response.status == 200:
+                    logger.info(f"Платеж {yookassa_payment_id} отменен")
+                    return True
+                else:
+                    logger.error(f"Ошибка отмены платежа: {response.status}")
+                    return False
                     
-                    if response.status == 200:
-                        logger.info(f"Платеж {yookassa_payment_id} отменен")
-                        return True
-                    else:
-                        logger.error(f"Ошибка отмены платежа: {response.status}")
-                        return False
-                        
         except Exception as e:
             logger.error(f"Исключение при отмене платежа: {e}")
             return False
@@ -264,7 +308,7 @@ class YooKassaService:
         try:
             # В тестовом режиме возвращаем тестовый ID
             if self.test_mode:
-                refund_id = f"test_refund_{uuid.uuid4()}"
+                refund_id = f"test_refund_{uuid.uuid4().hex}"
                 logger.info(f"Создан тестовый возврат {refund_id} для платежа {yookassa_payment_id}")
                 return refund_id
             
@@ -279,26 +323,25 @@ class YooKassaService:
             
             headers = {
                 "Content-Type": "application/json",
-                "Idempotence-Key": str(uuid.uuid4())
+                "Idempotence-Key": uuid.uuid4().hex
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/refunds",
-                    json=data,
-                    headers=headers,
-                    auth=self._get_auth()
-                ) as response:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/refunds",
+                json=data,
+                headers=headers
+            ) as response:
+                
+                if response.status == 200:
+                    result = await response.json()
+                    refund_id = result["id"]
+                    logger.info(f"Создан возврат {refund_id} для платежа {yookassa_payment_id}")
+                    return refund_id
+                else:
+                    logger.error(f"Ошибка создания возврата: {response.status}")
+                    return None
                     
-                    if response.status == 200:
-                        result = await response.json()
-                        refund_id = result["id"]
-                        logger.info(f"Создан возврат {refund_id} для платежа {yookassa_payment_id}")
-                        return refund_id
-                    else:
-                        logger.error(f"Ошибка создания возврата: {response.status}")
-                        return None
-                        
         except Exception as e:
             logger.error(f"Исключение при создании возврата: {e}")
             return None
@@ -214,7 +214,6 @@ class TaskScheduler:
     async def _backup_database(self):
         """Создание бэкапа базы данных"""
         try:
-            import shutil
             from pathlib import Path
             from config.settings import DATABASE_PATH
             
@@ -226,8 +225,9 @@ class TaskScheduler:
             backup_name = f"users_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
             backup_path = backup_dir / backup_name
             
-            # Копируем файл базы данных
-            shutil.copy2(DATABASE_PATH, backup_path)
+            # Копируем базу через SQLite backup API: в режиме WAL свежие
+            # страницы лежат в users.db-wal, и копия одного файла неполная
+            await asyncio.to_thread(self._copy_database, DATABASE_PATH, backup_path)
             
             # Удаляем старые бэкапы (оставляем последние 7)
             backup_files = sorted(backup_dir.glob("users_backup_*.db"))
@@ -254,6 +254,15 @@ class TaskScheduler:
                     f"❌ Ошибка создания бэкапа базы данных: {str(e)}"
                 )
     
+    @staticmethod
+    def _copy_database(source, target):
+        """Согласованная копия базы SQLite с учетом WAL"""
+        import sqlite3
+        from contextlib import closing
+        
+        with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+            src.backup(dst)
+    
     def get_job_status(self) -> dict:
         """Получить статус всех задач"""
         try:
@@ -9,8 +9,9 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from database.database import Database
+from database.database import Database, READER_POOL_SIZE
 from database.models import User, Payment, PaymentStatus, SubscriptionStatus
+from utils.helpers import safe_json_dumps
 
 
 class TestDatabase:
@@ -28,6 +29,7 @@ class TestDatabase:
         yield db
         
         # Очистка после теста
+        await db.close()
         os.unlink(db_path)
     
     @pytest.mark.asyncio
@@ -37,15 +39,19 @@ class TestDatabase:
         assert os.path.exists(temp_db.db_path)
         
         # Проверяем, что таблицы созданы
-        async with temp_db._get_connection() as conn:
-            tables = await conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table'"
-            )
-            table_names = [row[0] for row in await tables.fetchall()]
-            
-            expected_tables = ['users', 'payments', 'invite_links', 'subscription_history']
-            for table in expected_tables:
-                assert table in table_names
+        conn = await temp_db._get_connection()
+        tables = await conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        )
+        table_names = [row[0] for row in await tables.fetchall()]
+        
+        expected_tables = ['users', 'payments', 'invite_links', 'subscription_history']
+        for table in expected_tables:
+            assert table in table_names
+        
+        # Проверяем настройки соединения
+        journal_mode = await conn.execute("PRAGMA journal_mode")
+        assert (await journal_mode.fetchone())[0] == "wal"
     
     @pytest.mark.asyncio
     async def test_user_creation_and_retrieval(self, temp_db):
@@ -82,6 +88,7 @@ class TestDatabase:
             first_name="Test"
         )
         await temp_db.save_user(user)
+        created_at = (await temp_db.get_user(123456789)).created_at
         
         # Обновляем пользователя
         user.first_name = "Updated"
@@ -89,10 +96,17 @@ class TestDatabase:
         result = await temp_db.save_user(user)
         assert result is True
         
-        # Проверяем обновление
+        # Проверяем обновление (закэшированная строка сбрасывается при записи)
         updated_user = await temp_db.get_user(123456789)
         assert updated_user.first_name == "Updated"
+        
+        # Изменение полученного объекта без сохранения не попадает в кэш
+        updated_user.first_name = "Unsaved"
+        assert (await temp_db.get_user(123456789)).first_name == "Updated"
         assert updated_user.subscription_status == SubscriptionStatus.ACTIVE
+        # Дата создания не перезаписывается при обновлении
+        assert created_at is not None
+        assert updated_user.created_at == created_at
     
     @pytest.mark.asyncio
     async def test_payment_creation_and_retrieval(self, temp_db):
@@ -108,7 +122,8 @@ class TestDatabase:
             yookassa_payment_id="yoo_123",
             amount=500.0,
             status=PaymentStatus.PENDING,
-            description="Test payment"
+            description="Test payment",
+            metadata={"user_id": "123456789", "source": "telegram_bot"}
         )
         
         # Сохраняем платеж
@@ -122,6 +137,52 @@ class TestDatabase:
         assert retrieved_payment.user_id == 123456789
         assert retrieved_payment.amount == 500.0
         assert retrieved_payment.status == PaymentStatus.PENDING
+        assert retrieved_payment.metadata == {"user_id": "123456789", "source": "telegram_bot"}
+        
+        # Нестроковые ключи сохраняются (как строки), а не теряются
+        assert Database._load_metadata(safe_json_dumps({1: "a", "b": 2})) == {"1": "a", "b": 2}
+        
+        # Старые записи с metadata в виде repr словаря тоже читаются
+        assert Database._load_metadata("{'source': 'telegram_bot'}") == {"source": "telegram_bot"}
+        
+        # Платеж доступен только владельцу
+        assert await temp_db.get_payment_for_user("test_payment_123", 123456789) is not None
+        assert await temp_db.get_payment_for_user("test_payment_123", 987654321) is None
+    
+    @pytest.mark.asyncio
+    async def test_payment_status_update(self, temp_db):
+        """Тест атомарного обновления статуса платежа"""
+        await temp_db.save_user(User(user_id=123456789, username="test_user"))
+        await temp_db.save_payment(Payment(
+            user_id=123456789,
+            payment_id="test_payment_123",
+            amount=500.0,
+            status=PaymentStatus.PENDING
+        ))
+        
+        # Чужой платеж не обновляется
+        assert await temp_db.update_payment_status(
+            "test_payment_123", 987654321, PaymentStatus.SUCCEEDED
+        ) is None
+        
+        updated = await temp_db.update_payment_status(
+            "test_payment_123", 123456789, PaymentStatus.SUCCEEDED, datetime.now()
+        )
+        assert updated is not None
+        assert updated.status == PaymentStatus.SUCCEEDED
+        assert updated.completed_at is not None
+        
+        # Повторное обновление тем же статусом ничего не меняет
+        assert await temp_db.update_payment_status(
+            "test_payment_123", 123456789, PaymentStatus.SUCCEEDED
+        ) is None
+        
+        # Отмена только из ожидающего статуса не перезаписывает успешный платеж
+        assert await temp_db.update_payment_status(
+            "test_payment_123", 123456789, PaymentStatus.CANCELED,
+            expected_status=PaymentStatus.PENDING
+        ) is None
+        assert (await temp_db.get_payment("test_payment_123")).status == PaymentStatus.SUCCEEDED
     
     @pytest.mark.asyncio
     async def test_expired_users_retrieval(self, temp_db):
@@ -157,6 +218,51 @@ class TestDatabase:
         # Должен быть только user1
         assert len(expired_users) == 1
         assert expired_users[0].user_id == 111
+        
+        # Деактивация одним запросом возвращает тех же пользователей
+        deactivated = await temp_db.expire_due_users()
+        assert [user.user_id for user in deactivated] == [111]
+        assert deactivated[0].subscription_status == SubscriptionStatus.EXPIRED
+        assert deactivated[0].is_active is False
+        assert await temp_db.get_expired_users() == []
+        assert await temp_db.expire_due_users() == []
+    
+    @pytest.mark.asyncio
+    async def test_active_user_ids_iteration(self, temp_db):
+        """Тест потокового получения ID активных пользователей"""
+        for user_id in range(1, 8):
+            await temp_db.save_user(User(
+                user_id=user_id,
+                subscription_status=SubscriptionStatus.ACTIVE,
+                subscription_end=datetime.now() + timedelta(days=30)
+            ))
+        await temp_db.save_user(User(user_id=100, subscription_status=SubscriptionStatus.EXPIRED))
+        
+        # Маленький размер страницы, чтобы проверить постраничную выборку
+        user_ids = [user_id async for user_id in temp_db.iter_active_user_ids(batch_size=3)]
+        
+        assert user_ids == list(range(1, 8))
+        assert await temp_db.count_active_users() == 7
+    
+    @pytest.mark.asyncio
+    async def test_aggregate_stats(self, temp_db):
+        """Тест агрегированной статистики пользователей и платежей"""
+        for user in [
+            User(user_id=1, subscription_status=SubscriptionStatus.ACTIVE),
+            User(user_id=2, subscription_status=SubscriptionStatus.ACTIVE),
+            User(user_id=3, subscription_status=SubscriptionStatus.EXPIRED),
+        ]:
+            await temp_db.save_user(user)
+        assert await temp_db.count_users_by_status() == {"active": 2, "expired": 1}
+        
+        for payment in [
+            Payment(user_id=1, payment_id="p1", amount=500.0, status=PaymentStatus.SUCCEEDED),
+            Payment(user_id=2, payment_id="p2", amount=300.0, status=PaymentStatus.SUCCEEDED),
+            Payment(user_id=3, payment_id="p3", amount=500.0, status=PaymentStatus.CANCELED),
+            Payment(user_id=3, payment_id="p4", amount=500.0, status=PaymentStatus.PENDING),
+        ]:
+            await temp_db.save_payment(payment)
+        assert await temp_db.get_payment_stats(days=1) == (800.0, 2, 1)
     
     @pytest.mark.asyncio
     async def test_user_properties(self, temp_db):
@@ -172,12 +278,26 @@ class TestDatabase:
         # Тест full_name
         assert user.full_name == "John Doe"
         
+        # Модели без __dict__ (slots)
+        assert not hasattr(user, "__dict__")
+        
         # Тест is_subscription_active
         assert user.is_subscription_active is True
         
         # Тест days_left
         assert user.days_left == 15
         
+        # Проверки на заданный момент времени
+        later = datetime.now() + timedelta(days=20)
+        assert user.is_subscription_active_at(later) is False
+        assert user.days_left_at(later) == 0
+        
+        # Тест subscription_end_fmt (пересчитывается при изменении даты)
+        user.subscription_end = datetime(2024, 1, 15, 10, 30)
+        assert user.subscription_end_fmt == "15.01.2024 10:30"
+        user.subscription_end = datetime(2024, 2, 1, 9, 5)
+        assert user.subscription_end_fmt == "01.02.2024 09:05"
+        
         # Тест с истекшей подпиской
         user.subscription_end = datetime.now() - timedelta(days=1)
         assert user.is_subscription_active is False
@@ -231,6 +351,35 @@ class TestDatabase:
             retrieved = await temp_db.get_user(user.user_id)
             assert retrieved is not None
             assert retrieved.user_id == user.user_id
+    
+    @pytest.mark.asyncio
+    async def test_parallel_reads_use_reader_pool(self, temp_db):
+        """Тест чтения через пул соединений только для чтения"""
+        await temp_db.save_user(User(user_id=42, username="reader"))
+        
+        # Одновременные чтения видят закоммиченную запись
+        users = await asyncio.gather(*[temp_db.get_user(42) for _ in range(20)])
+        assert all(user is not None and user.username == "reader" for user in users)
+        
+        # Пул не превышает заданный размер
+        assert 0 < temp_db._readers_opened <= READER_POOL_SIZE
+        
+        # Соединения пула не принимают запись
+        async with temp_db._acquire_reader() as reader:
+            with pytest.raises(Exception):
+                await reader.execute("DELETE FROM users")
+    
+    @pytest.mark.asyncio
+    async def test_reader_released_after_close(self, temp_db):
+        """Тест: чтение, идущее во время close(), не ломается и не теряет соединение"""
+        async with temp_db._acquire_reader() as reader:
+            await temp_db.close()
+        
+        # Соединение закрыто, а не возвращено в закрытый пул
+        assert temp_db._readers is None
+        with pytest.raises(Exception):
+            await reader.execute("SELECT 1")
+
 
 
 @pytest.fixture(scope="session")
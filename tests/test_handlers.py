@@ -223,21 +223,30 @@ class TestPaymentHandlers:
                 amount=500.0,
                 status=PaymentStatus.PENDING
             )
-            mock_db.get_payment.return_value = mock_payment
+            mock_db.get_payment_for_user.return_value = mock_payment
             
             mock_yookassa_payment = {"status": "succeeded"}
             mock_yookassa.get_payment_info.return_value = mock_yookassa_payment
             
             mock_sub_service.activate_subscription.return_value = True
-            mock_db.save_payment.return_value = True
+            mock_db.update_payment_status.return_value = mock_payment
             
             # Вызываем обработчик
             await payment.check_payment_callback(mock_callback, mock_state)
             
             # Проверяем результат
+            mock_db.update_payment_status.assert_called_once()
             mock_sub_service.activate_subscription.assert_called_once()
             mock_callback.message.edit_text.assert_called_once()
             mock_state.clear.assert_called_once()
+    
+    def test_payment_callback_filter(self):
+        """Тест фильтра callback'ов платежа: нужен префикс и разделитель"""
+        assert payment._is_payment_callback("check_payment:test_123")
+        assert payment._is_payment_callback("cancel_payment:test_123")
+        assert not payment._is_payment_callback("check_payment")
+        assert not payment._is_payment_callback("unknown:test_123")
+        assert not payment._is_payment_callback(None)
 
 
 class TestStatusHandlers:
@@ -330,12 +339,12 @@ class TestStatusHandlers:
                 "member_count": 1500,
                 "title": "Test Channel"
             }
-            mock_telegram.get_channel_info.return_value = mock_channel_info
+            mock_telegram.get_cached_channel_info.return_value = mock_channel_info
             
             await status.info_command(mock_message)
             
             # Проверяем вызовы
-            mock_telegram.get_channel_info.assert_called_once()
+            mock_telegram.get_cached_channel_info.assert_called_once()
             mock_message.answer.assert_called_once()
             
             # Проверяем содержимое ответа
@@ -0,0 +1,128 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetChatMember, SendMessage
+from bot.middleware.rate_limit import RateLimitMiddleware, TokenBucket
+
+
+class TestTokenBucket:
+    """Тесты ограничителя частоты"""
+    
+    @pytest.mark.asyncio
+    async def test_acquire_within_rate(self):
+        """Тест: пока есть токены, ожидания нет"""
+        bucket = TokenBucket(rate=3, period=1.0)
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            for _ in range(3):
+                await bucket.acquire()
+        
+        mock_sleep.assert_not_awaited()
+        assert not bucket.is_idle
+    
+    @pytest.mark.asyncio
+    async def test_acquire_waits_when_empty(self):
+        """Тест: при пустом ведре вызовы ждут своей очереди"""
+        bucket = TokenBucket(rate=2, period=1.0)
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            for _ in range(4):
+                await bucket.acquire()
+        
+        # Третий вызов ждет полтокена, четвертый - на полтокена дольше
+        waits = [call.args[0] for call in mock_sleep.await_args_list]
+        assert len(waits) == 2
+        assert waits[0] == pytest.approx(0.5, abs=0.05)
+        assert waits[1] == pytest.approx(1.0, abs=0.05)
+
+
+class TestRateLimitMiddleware:
+    """Тесты middleware ограничения запросов к Telegram"""
+    
+    @pytest.fixture
+    def make_request(self):
+        return AsyncMock(return_value="ok")
+    
+    @pytest.mark.asyncio
+    async def test_service_requests_skip_chat_limit(self, make_request):
+        """Тест: служебные запросы к каналу не ждут лимита на чат"""
+        middleware = RateLimitMiddleware(per_chat_rate=1, per_chat_period=10.0)
+        method = GetChatMember(chat_id=-1001234567890, user_id=123456789)
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            for _ in range(5):
+                assert await middleware(make_request, MagicMock(), method) == "ok"
+        
+        mock_sleep.assert_not_awaited()
+        assert make_request.await_count == 5
+        assert middleware.chat_limiters == {}
+    
+    @pytest.mark.asyncio
+    async def test_group_limit(self, make_request):
+        """Тест минутного лимита сообщений в группу"""
+        middleware = RateLimitMiddleware(group_rate=1, group_period=60.0)
+        method = SendMessage(chat_id=-1001234567890, text="Test message")
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            await middleware(make_request, MagicMock(), method)
+            await middleware(make_request, MagicMock(), method)
+        
+        mock_sleep.assert_awaited_once()
+        assert mock_sleep.await_args.args[0] == pytest.approx(60.0, abs=0.5)
+        
+        # Личные чаты лимитом групп не ограничены
+        assert -1001234567890 in middleware.group_limiters
+        await middleware(make_request, MagicMock(), SendMessage(chat_id=123456789, text="Hi"))
+        assert 123456789 not in middleware.group_limiters
+    
+    @pytest.mark.asyncio
+    async def test_retry_after(self, make_request):
+        """Тест повтора запроса после RetryAfter"""
+        middleware = RateLimitMiddleware()
+        method = SendMessage(chat_id=123456789, text="Test message")
+        make_request.side_effect = [
+            TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=2),
+            "ok",
+        ]
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            result = await middleware(make_request, MagicMock(), method)
+        
+        assert result == "ok"
+        assert make_request.await_count == 2
+        mock_sleep.assert_awaited_once_with(2)
+    
+    @pytest.mark.asyncio
+    async def test_retry_after_gives_up(self, make_request):
+        """Тест: после max_retries ошибка RetryAfter пробрасывается"""
+        middleware = RateLimitMiddleware(max_retries=1)
+        method = SendMessage(chat_id=123456789, text="Test message")
+        make_request.side_effect = TelegramRetryAfter(
+            method=method, message="Too Many Requests", retry_after=1
+        )
+        
+        with patch("asyncio.sleep", new_callable=AsyncMock):
+            with pytest.raises(TelegramRetryAfter):
+                await middleware(make_request, MagicMock(), method)
+        
+        assert make_request.await_count == 2
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Создание event loop для тестов"""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
+
+
+if __name__ == "__main__":
+    # Запуск тестов
+    pytest.main([__file__, "-v"])
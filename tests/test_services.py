@@ -8,6 +8,7 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from aiogram.enums import ChatMemberStatus
 from aiogram.types import User as TgUser
 from services.subscription_service import SubscriptionService
 from services.yookassa_service import YooKassaService
@@ -149,6 +150,29 @@ class TestSubscriptionService:
             assert user.is_active is False
             mock_telegram.kick_user_from_channel.assert_called_once_with(123456789)
     
+    @pytest.mark.asyncio
+    async def test_check_and_expire_subscriptions(self, subscription_service):
+        """Тест обработки истекших подписок"""
+        with patch('services.subscription_service.db') as mock_db, \
+             patch('services.subscription_service.telegram_service') as mock_telegram, \
+             patch('services.subscription_service.notification_service') as mock_notification:
+            
+            expired_users = [
+                User(user_id=i, subscription_status=SubscriptionStatus.EXPIRED, is_active=False)
+                for i in range(1, 6)
+            ]
+            mock_db.expire_due_users = AsyncMock(return_value=expired_users)
+            mock_telegram.kick_user_from_channel = AsyncMock(return_value=True)
+            # Ошибка у одного пользователя не мешает обработке остальных
+            mock_notification.send_subscription_expired = AsyncMock(
+                side_effect=[True, True, Exception("boom"), True, True]
+            )
+            
+            result = await subscription_service.check_and_expire_subscriptions()
+            
+            assert result == 4
+            assert mock_telegram.kick_user_from_channel.await_count == 5
+    
     @pytest.mark.asyncio
     async def test_get_subscription_status(self, subscription_service):
         """Тест получения статуса подписки"""
@@ -160,8 +184,6 @@ class TestSubscriptionService:
                 total_payments=3,
                 created_at=datetime.now() - timedelta(days=90)
             )
-            user.is_subscription_active = True
-            user.days_left = 15
             mock_db.get_user.return_value = user
             
             status = await subscription_service.get_subscription_status(123456789)
@@ -169,7 +191,7 @@ class TestSubscriptionService:
             assert status is not None
             assert status["is_active"] is True
             assert status["status"] == "active"
-            assert status["days_left"] == 15
+            assert status["days_left"] == 14
             assert status["total_payments"] == 3
 
 
@@ -262,6 +284,22 @@ class TestYooKassaService:
             assert payment_info["status"] == "succeeded"
             assert payment_info["amount"]["value"] == "500.00"
     
+    @pytest.mark.asyncio
+    async def test_get_payment_info_coalesces_concurrent_requests(self, yookassa_service):
+        """Тест объединения одновременных запросов одного платежа"""
+        async def slow_fetch(yookassa_payment_id):
+            await asyncio.sleep(0.01)
+            return {"id": yookassa_payment_id, "status": "pending"}
+        
+        with patch.object(yookassa_service, '_fetch_payment_info', side_effect=slow_fetch) as mock_fetch:
+            results = await asyncio.gather(*[
+                yookassa_service.get_payment_info("yoo_payment_123") for _ in range(5)
+            ])
+            
+            assert mock_fetch.call_count == 1
+            assert all(result["status"] == "pending" for result in results)
+            assert not yookassa_service._inflight_payment_info
+    
     def test_parse_webhook_notification(self, yookassa_service):
         """Тест парсинга webhook уведомления"""
         notification_data = {
@@ -311,14 +349,18 @@ class TestTelegramService:
     @pytest.mark.asyncio
     async def test_kick_user_from_channel(self, telegram_service):
         """Тест исключения пользователя из канала"""
-        telegram_service.bot.ban_chat_member.return_value = None
         telegram_service.bot.unban_chat_member.return_value = None
         
         result = await telegram_service.kick_user_from_channel(123456789)
         
         assert result is True
-        telegram_service.bot.ban_chat_member.assert_called_once()
-        telegram_service.bot.unban_chat_member.assert_called_once()
+        # Исключение одним запросом: unban без only_if_banned удаляет участника
+        telegram_service.bot.ban_chat_member.assert_not_called()
+        telegram_service.bot.unban_chat_member.assert_called_once_with(
+            chat_id=telegram_service.channel_id,
+            user_id=123456789,
+            only_if_banned=False
+        )
     
     @pytest.mark.asyncio
     async def test_send_message(self, telegram_service):
@@ -352,12 +394,83 @@ class TestTelegramService:
         
         telegram_service.bot.send_message.side_effect = side_effect
         
-        result = await telegram_service.broadcast_message(user_ids, "Broadcast message")
+        async def iter_user_ids():
+            for user_id in user_ids:
+                yield user_id
+        
+        progress = AsyncMock()
+        result = await telegram_service.broadcast_message(
+            iter_user_ids(), "Broadcast message", on_progress=progress
+        )
         
         assert result["total"] == 3
         assert result["sent"] == 1
         assert result["blocked"] == 1
         assert result["failed"] == 1
+        # Все получатели поместились в одну пачку
+        progress.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_get_cached_channel_info(self, telegram_service):
+        """Тест кэширования информации о канале"""
+        channel_info = {"title": "Test Channel", "member_count": 1500}
+        
+        with patch.object(telegram_service, 'get_channel_info', AsyncMock(return_value=channel_info)) as mock_get:
+            # Одновременные запросы и повторный запрос в пределах TTL - один вызов API
+            results = await asyncio.gather(*[
+                telegram_service.get_cached_channel_info() for _ in range(3)
+            ])
+            assert await telegram_service.get_cached_channel_info() == channel_info
+            assert all(result == channel_info for result in results)
+            assert mock_get.call_count == 1
+            
+            # Принудительное обновление запрашивает данные заново
+            await telegram_service.get_cached_channel_info(force_refresh=True)
+            assert mock_get.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_check_user_in_channel_cached(self, telegram_service):
+        """Тест кэширования членства в канале"""
+        member = MagicMock()
+        member.status = ChatMemberStatus.MEMBER
+        telegram_service.bot.get_chat_member = AsyncMock(return_value=member)
+        telegram_service.bot.unban_chat_member = AsyncMock()
+        
+        assert await telegram_service.check_user_in_channel(123456789) is True
+        assert await telegram_service.check_user_in_channel(123456789) is True
+        assert telegram_service.bot.get_chat_member.await_count == 1
+        
+        # Исключение из канала сбрасывает закэшированное членство
+        member.status = ChatMemberStatus.LEFT
+        await telegram_service.kick_user_from_channel(123456789)
+        assert await telegram_service.check_user_in_channel(123456789) is False
+        assert telegram_service.bot.get_chat_member.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_member_cache_ignores_fetch_started_before_kick(self, telegram_service):
+        """Тест: запрос членства, начатый до исключения, не попадает в кэш"""
+        member = MagicMock()
+        member.status = ChatMemberStatus.MEMBER
+        release = asyncio.Event()
+        
+        async def slow_get_chat_member(**kwargs):
+            await release.wait()
+            return member
+        
+        telegram_service.bot.get_chat_member = AsyncMock(side_effect=slow_get_chat_member)
+        telegram_service.bot.unban_chat_member = AsyncMock()
+        
+        in_flight = asyncio.create_task(telegram_service.check_user_in_channel(123456789))
+        await asyncio.sleep(0)
+        
+        await telegram_service.kick_user_from_channel(123456789)
+        release.set()
+        await in_flight
+        
+        # Устаревший ответ не закэширован - следующая проверка идет в API
+        member.status = ChatMemberStatus.LEFT
+        assert await telegram_service.check_user_in_channel(123456789) is False
+        assert telegram_service.bot.get_chat_member.await_count == 2
 
 
 class TestNotificationService:
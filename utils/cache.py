@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Простой in-memory кэш с временем жизни записей"""
+    
+    def __init__(self, ttl: float = 60, maxsize: Optional[int] = None):
+        """
+        Args:
+            ttl: Время жизни записи в секундах по умолчанию
+            maxsize: Максимальное число записей (при переполнении вытесняется
+                давно не использованная), None - без ограничения
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, Tuple[Any, float]] = {}  # {key: (value, expiry_time)}
+        # Вычисления значений, которые сейчас выполняются: {key: future}
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        # Номер поколения: растет при каждом invalidate, результат вычисления,
+        # начатого до сброса, в кэш не сохраняется
+        self._generation = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Получить значение из кэша
+        
+        Args:
+            key: Ключ
+            default: Значение, если записи нет или она устарела
+        
+        Returns:
+            Закэшированное значение или default
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        
+        value, expiry_time = entry
+        if time.monotonic() >= expiry_time:
+            del self._data[key]
+            return default
+        
+        if self.maxsize is not None:
+            # Переносим в конец: порядок словаря - от давно не использованных
+            self._data[key] = self._data.pop(key)
+        
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Сохранить значение в кэш
+        
+        Args:
+            key: Ключ
+            value: Значение
+            ttl: Время жизни в секундах (по умолчанию - ttl кэша)
+        """
+        if self.maxsize is not None:
+            self._data.pop(key, None)
+            while len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+        
+        self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+    
+    def invalidate(self, key: Optional[Hashable] = None):
+        """
+        Удалить запись из кэша
+        
+        Args:
+            key: Ключ (если не указан - очищается весь кэш)
+        """
+        self._generation += 1
+        if key is None:
+            self._data.clear()
+            self._pending.clear()
+        else:
+            self._data.pop(key, None)
+            # Следующий запрос начнет новое вычисление, а не дождется устаревшего
+            self._pending.pop(key, None)
+    
+    async def get_or_set(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Получить значение из кэша или вычислить и сохранить его
+        
+        Одновременные промахи по одному ключу ждут одно общее вычисление.
+        
+        Args:
+            key: Ключ
+            factory: Корутина-функция для получения значения при промахе
+            ttl: Время жизни в секундах (по умолчанию - ttl кэша)
+        
+        Returns:
+            Значение (None от factory не кэшируется - это признак ошибки)
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute(key, factory, ttl, self._generation))
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._forget_pending(key, done))
+        
+        # shield: отмена одного из ожидающих не отменяет общее вычисление
+        return await asyncio.shield(future)
+    
+    async def _compute(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+        generation: int
+    ) -> Any:
+        """Вычислить значение и сохранить его в кэш (если кэш не сбрасывался за время вычисления)"""
+        value = await factory()
+        if value is not None and generation == self._generation:
+            self.set(key, value, ttl)
+        
+        return value
+    
+    def _forget_pending(self, key: Hashable, future: asyncio.Future):
+        """Убрать завершенное вычисление (если его еще не заменило новое после invalidate)"""
+        if self._pending.get(key) is future:
+            del self._pending[key]
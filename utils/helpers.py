@@ -3,10 +3,15 @@ import json
 import hashlib
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from urllib.parse import urlparse
 import logging
 
+try:
+    import orjson
+except ImportError:  # orjson не установлен - используем стандартный json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,6 +85,24 @@ def format_datetime(dt: datetime, format_type: str = "full") -> str:
     return dt.strftime(format_str)
 
 
+def format_dt(dt: datetime, sep: str = " ", with_time: bool = True) -> str:
+    """
+    Форматирование даты как ДД.ММ.ГГГГ<sep>ЧЧ:ММ (без strftime - из полей datetime)
+    
+    Args:
+        dt: Объект datetime
+        sep: Разделитель даты и времени (например, " в ")
+        with_time: Добавлять ли время
+        
+    Returns:
+        Отформатированная строка
+    """
+    date_text = f"{dt.day:02d}.{dt.month:02d}.{dt.year}"
+    if not with_time:
+        return date_text
+    return f"{date_text}{sep}{dt.hour:02d}:{dt.minute:02d}"
+
+
 def format_currency(amount: float, currency: str = "RUB") -> str:
     """
     Форматирование суммы с валютой
@@ -195,12 +218,29 @@ def safe_json_loads(json_str: str, default: Any = None) -> Any:
         return default
     
     try:
+        if orjson is not None:
+            return orjson.loads(json_str)
         return json.loads(json_str)
     except (json.JSONDecodeError, TypeError):
         logger.warning(f"Failed to parse JSON: {json_str}")
         return default
 
 
+def json_dumps(data: Any) -> str:
+    """Сериализация в JSON через orjson, если он установлен (ошибки не подавляются)"""
+    if orjson is not None:
+        # Нестроковые ключи словарей превращаются в строки - как в стандартном json
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False)
+
+
+def json_loads(json_str: str) -> Any:
+    """Парсинг JSON через orjson, если он установлен (ошибки не подавляются)"""
+    if orjson is not None:
+        return orjson.loads(json_str)
+    return json.loads(json_str)
+
+
 def safe_json_dumps(data: Any) -> str:
     """
     Безопасная сериализация в JSON
@@ -212,6 +252,9 @@ def safe_json_dumps(data: Any) -> str:
         JSON строка
     """
     try:
+        if orjson is not None:
+            # Нестроковые ключи словарей превращаются в строки - как в стандартном json
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
         return json.dumps(data, ensure_ascii=False)
     except (TypeError, ValueError) as e:
         logger.warning(f"Failed to serialize to JSON: {e}")
@@ -415,6 +458,28 @@ def chunk_list(lst: List, chunk_size: int) -> List[List]:
     return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
 
 
+async def iter_chunks(iterator: AsyncIterator, chunk_size: int) -> AsyncIterator[List]:
+    """
+    Разбиение асинхронного итератора на чанки
+    
+    Args:
+        iterator: Исходный асинхронный итератор
+        chunk_size: Размер чанка
+        
+    Returns:
+        Асинхронный итератор чанков
+    """
+    chunk = []
+    async for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    
+    if chunk:
+        yield chunk
+
+
 def is_admin_user(user_id: int) -> bool:
     """
     Проверка, является ли пользователь администратором
@@ -153,14 +153,18 @@ async def handle_payment_succeeded(user_id: int, yookassa_payment_id: str, amoun
         payment: Объект платежа из БД (если есть)
     """
     try:
-        # Обновляем платеж в базе данных
         if payment:
-            payment.status = PaymentStatus.SUCCEEDED
-            payment.completed_at = datetime.now()
-            await db.save_payment(payment)
+            # Атомарно отмечаем платеж успешным: если его уже обработала кнопка
+            # "Проверить оплату" или повторный webhook, подписку не активируем
+            updated_payment = await db.update_payment_status(
+                payment.payment_id, user_id, PaymentStatus.SUCCEEDED, datetime.now()
+            )
+            if not updated_payment:
+                logger.info(f"Платеж {payment.payment_id} уже обработан")
+                return
             
             # Активируем подписку
-            success = await subscription_service.activate_subscription(user_id, payment)
+            success = await subscription_service.activate_subscription(user_id, updated_payment)
             
             if success:
                 payment_logger.payment_succeeded(user_id, payment.payment_id, amount)
@@ -191,10 +195,16 @@ async def handle_payment_canceled(user_id: int, yookassa_payment_id: str, paymen
         payment: Объект платежа из БД (если есть)
     """
     try:
-        # Обновляем платеж в базе данных
         if payment:
-            payment.status = PaymentStatus.CANCELED
-            await db.save_payment(payment)
+            # Отменяем только ожидающий платеж; уже отмененный пользователем
+            # или обработанный платеж не трогаем и повторно не уведомляем
+            updated_payment = await db.update_payment_status(
+                payment.payment_id, user_id, PaymentStatus.CANCELED,
+                expected_status=PaymentStatus.PENDING
+            )
+            if not updated_payment:
+                logger.info(f"Платеж {payment.payment_id} уже обработан")
+                return
             
             payment_logger.payment_failed(user_id, payment.payment_id, "canceled")
         
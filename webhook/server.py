@@ -149,7 +149,9 @@ async def start_webhook_server():
 # Для запуска сервера отдельно
 if __name__ == "__main__":
     from utils.logger import setup_logging
-    from config.settings import LOG_LEVEL, LOG_DIR
+    from config.settings import LOG_LEVEL, LOG_DIR, ensure_dirs
+    
+    ensure_dirs()
     
     # Настройка логирования
     setup_logging(level=LOG_LEVEL, log_dir=LOG_DIR)